@@ -0,0 +1,34 @@
+"""02_clicks-counter
+
+Revision ID: 0f723d4784eb
+Revises: 3a55dd762dd4
+Create Date: 2026-10-18 10:30:12.418230
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0f723d4784eb'
+down_revision: Union[str, None] = '3a55dd762dd4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_shorted_url_info_url_id_created_at', 'shorted_url_info', ['url_id', 'created_at'], unique=False)
+    op.add_column('shorted_url', sa.Column('clicks', sa.Integer(), server_default='0', nullable=False))
+    # backfill counters from the click history collected so far
+    op.execute(
+        'UPDATE shorted_url SET clicks = ('
+        'SELECT count(*) FROM shorted_url_info '
+        'WHERE shorted_url_info.url_id = shorted_url.id)'
+    )
+
+
+def downgrade() -> None:
+    op.drop_column('shorted_url', 'clicks')
+    op.drop_index('ix_shorted_url_info_url_id_created_at', table_name='shorted_url_info')
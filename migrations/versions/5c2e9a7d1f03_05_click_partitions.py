@@ -0,0 +1,90 @@
+"""05_click-partitions
+
+Revision ID: 5c2e9a7d1f03
+Revises: b81d5e0c2a47
+Create Date: 2026-10-18 13:20:41.508127
+
+"""
+from datetime import datetime
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5c2e9a7d1f03'
+down_revision: Union[str, None] = 'b81d5e0c2a47'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# monthly partitions created ahead of now, maintenance keeps it going
+AHEAD_MONTHS = 2
+COLUMNS = 'id, created_at, host, port, user_agent, url_id, user_id'
+
+
+def _month(moment: datetime, months: int = 0) -> datetime:
+    index = moment.year * 12 + moment.month - 1 + months
+    return datetime(index // 12, index % 12 + 1, 1)
+
+
+def _rename_old() -> None:
+    op.execute('ALTER TABLE shorted_url_info RENAME TO shorted_url_info_old')
+    op.execute('ALTER INDEX shorted_url_info_pkey RENAME TO shorted_url_info_old_pkey')
+    op.execute('ALTER INDEX ix_shorted_url_info_created_at RENAME TO ix_shorted_url_info_old_created_at')
+    op.execute('ALTER INDEX ix_shorted_url_info_url_id_created_at RENAME TO ix_shorted_url_info_old_url_id_created_at')
+    # the id sequence outlives the table it came with
+    op.execute('ALTER SEQUENCE shorted_url_info_id_seq OWNED BY NONE')
+
+
+def _create(partition_by: str, primary_key: str) -> None:
+    op.execute(
+        'CREATE TABLE shorted_url_info ('
+        "id INTEGER NOT NULL DEFAULT nextval('shorted_url_info_id_seq'), "
+        'created_at TIMESTAMP WITHOUT TIME ZONE NOT NULL, '
+        'host VARCHAR(100) NOT NULL, '
+        'port INTEGER NOT NULL, '
+        'user_agent VARCHAR(1000) NOT NULL, '
+        'url_id BIGINT NOT NULL REFERENCES shorted_url (id), '
+        'user_id INTEGER REFERENCES "user" (id), '
+        f'PRIMARY KEY ({primary_key})'
+        f'){partition_by}'
+    )
+
+
+def _move_rows() -> None:
+    op.create_index('ix_shorted_url_info_created_at', 'shorted_url_info', ['created_at'], unique=False)
+    op.create_index('ix_shorted_url_info_url_id_created_at', 'shorted_url_info', ['url_id', 'created_at'], unique=False)
+    op.execute(f'INSERT INTO shorted_url_info ({COLUMNS}) SELECT {COLUMNS} FROM shorted_url_info_old')
+    op.execute('DROP TABLE shorted_url_info_old')
+    op.execute('ALTER SEQUENCE shorted_url_info_id_seq OWNED BY shorted_url_info.id')
+
+
+def upgrade() -> None:
+    # range partitioning is Postgres only, other databases keep the
+    # plain table and get retention by DELETE
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    oldest = op.get_bind().execute(sa.text('SELECT min(created_at) FROM shorted_url_info')).scalar()
+    now = datetime.utcnow()
+    _rename_old()
+    # the partition key has to be part of the primary key
+    _create(' PARTITION BY RANGE (created_at)', 'id, created_at')
+    op.execute('CREATE TABLE shorted_url_info_default PARTITION OF shorted_url_info DEFAULT')
+    month = _month(min(oldest, now) if oldest else now)
+    while month <= _month(now, AHEAD_MONTHS):
+        op.execute(
+            f'CREATE TABLE shorted_url_info_y{month.year}m{month.month:02d} '
+            'PARTITION OF shorted_url_info FOR VALUES '
+            f"FROM ('{month.isoformat()}') TO ('{_month(month, 1).isoformat()}')"
+        )
+        month = _month(month, 1)
+    _move_rows()
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    _rename_old()
+    _create('', 'id')
+    _move_rows()
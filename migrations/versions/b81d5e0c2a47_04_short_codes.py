@@ -0,0 +1,64 @@
+"""04_short-codes
+
+Revision ID: b81d5e0c2a47
+Revises: 74c9b88c31ee
+Create Date: 2026-10-18 11:48:05.662913
+
+"""
+from typing import Sequence, Union
+
+from alembic import context, op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b81d5e0c2a47'
+down_revision: Union[str, None] = '74c9b88c31ee'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+REFERENCES = (
+    ('shorted_url_info', 'url_id'),
+    ('click_rollup', 'url_id'),
+    ('click_top', 'url_id'),
+)
+# frozen copies of the settings the backfill depends on, replays of this
+# revision must not change with the runtime config; deployments serving
+# under another base pass it as `alembic -x short_url_base=... upgrade`
+SHORT_URL_BASE = 'http://localhost:8080/'
+CODE_ALPHABET = '0123456789abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ'
+CODE_MAX_LENGTH = 32
+
+
+def upgrade() -> None:
+    with op.batch_alter_table('shorted_url') as batch_op:
+        batch_op.alter_column('id', existing_type=sa.Integer(), type_=sa.BigInteger(), existing_nullable=False)
+        batch_op.add_column(sa.Column('code', sa.String(length=32), nullable=True))
+        batch_op.create_unique_constraint('uq_shorted_url_code', ['code'])
+    for table, column in REFERENCES:
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.alter_column(column, existing_type=sa.Integer(), type_=sa.BigInteger(), existing_nullable=False)
+    # backfill codes of short URLs served under the base
+    base = context.get_x_argument(as_dictionary=True).get('short_url_base', SHORT_URL_BASE)
+    bind = op.get_bind()
+    url = sa.table('shorted_url', sa.column('id'), sa.column('value'), sa.column('code'))
+    rows = bind.execute(
+        sa.select(url.c.id, url.c.value).where(url.c.value.startswith(base, autoescape=True))
+    ).all()
+    codes = [{'id_': id, 'code_': value[len(base):]} for id, value in rows]
+    codes = [
+        row for row in codes
+        if 0 < len(row['code_']) <= CODE_MAX_LENGTH and set(row['code_']) <= set(CODE_ALPHABET)
+    ]
+    if codes:
+        bind.execute(url.update().where(url.c.id == sa.bindparam('id_')).values(code=sa.bindparam('code_')), codes)
+
+
+def downgrade() -> None:
+    for table, column in REFERENCES:
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.alter_column(column, existing_type=sa.BigInteger(), type_=sa.Integer(), existing_nullable=False)
+    with op.batch_alter_table('shorted_url') as batch_op:
+        batch_op.drop_constraint('uq_shorted_url_code', type_='unique')
+        batch_op.drop_column('code')
+        batch_op.alter_column('id', existing_type=sa.BigInteger(), type_=sa.Integer(), existing_nullable=False)
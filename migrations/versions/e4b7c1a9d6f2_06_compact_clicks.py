@@ -0,0 +1,119 @@
+"""06_compact-clicks
+
+Revision ID: e4b7c1a9d6f2
+Revises: 5c2e9a7d1f03
+Create Date: 2026-10-18 14:02:17.318540
+
+"""
+import logging
+from ipaddress import ip_address
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e4b7c1a9d6f2'
+down_revision: Union[str, None] = '5c2e9a7d1f03'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+logger = logging.getLogger('alembic.runtime.migration')
+BATCH_SIZE = 10000
+
+
+def _convert_hosts(convert) -> None:
+    """Rewrite every host in Python by id range, for databases without INET"""
+    bind = op.get_bind()
+    info = sa.table('shorted_url_info', sa.column('id'), sa.column('host'))
+    update = info.update().where(info.c.id == sa.bindparam('id_')).values(host=sa.bindparam('host_'))
+    last_id = 0
+    while True:
+        rows = bind.execute(
+            sa.select(info.c.id, info.c.host).where(info.c.id > last_id).order_by(info.c.id).limit(BATCH_SIZE)
+        ).all()
+        if not rows:
+            return
+        bind.execute(update, [{'id_': id, 'host_': convert(host)} for id, host in rows])
+        last_id = rows[-1].id
+
+
+def _normalized(host: str) -> str:
+    try:
+        return str(ip_address(host.partition('%')[0]))
+    except ValueError:
+        return '0.0.0.0'
+
+
+def _normalize_hosts() -> None:
+    """Hosts that are no IP address become 0.0.0.0, scope ids are dropped"""
+    bind = op.get_bind()
+    hosts = bind.execute(sa.text('SELECT host, COUNT(*) FROM shorted_url_info GROUP BY host')).all()
+    changed = [{'host': host, 'normalized': _normalized(host)} for host, _ in hosts if _normalized(host) != host]
+    if changed:
+        bind.execute(sa.text('UPDATE shorted_url_info SET host = :normalized WHERE host = :host'), changed)
+    lost = [(host, clicks) for host, clicks in hosts if host != '0.0.0.0' and _normalized(host) == '0.0.0.0']
+    if lost:
+        logger.warning(
+            'Stored %s clicks from %s hosts that are no IP address as 0.0.0.0, e.g. %r',
+            sum(clicks for _, clicks in lost), len(lost), lost[0][0],
+        )
+
+
+def _pack(host: str) -> bytes:
+    return ip_address(host).packed
+
+
+def upgrade() -> None:
+    op.create_table(
+        'user_agent',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('value', sa.String(length=1000), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('value'),
+    )
+    op.add_column('shorted_url_info', sa.Column('user_agent_id', sa.Integer(), nullable=True))
+    op.execute('INSERT INTO user_agent (value) SELECT DISTINCT user_agent FROM shorted_url_info')
+    op.execute(
+        'UPDATE shorted_url_info SET user_agent_id = '
+        '(SELECT id FROM user_agent WHERE user_agent.value = shorted_url_info.user_agent)'
+    )
+    _normalize_hosts()
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute('ALTER TABLE shorted_url_info ALTER COLUMN host TYPE INET USING host::inet')
+    else:
+        _convert_hosts(_pack)
+        with op.batch_alter_table('shorted_url_info') as batch_op:
+            batch_op.alter_column(
+                'host', existing_type=sa.String(length=100), type_=sa.LargeBinary(length=16), existing_nullable=False
+            )
+    with op.batch_alter_table('shorted_url_info') as batch_op:
+        batch_op.alter_column('user_agent_id', existing_type=sa.Integer(), nullable=False)
+        batch_op.create_foreign_key('fk_shorted_url_info_user_agent_id', 'user_agent', ['user_agent_id'], ['id'])
+        batch_op.drop_column('user_agent')
+
+
+def downgrade() -> None:
+    op.add_column('shorted_url_info', sa.Column('user_agent', sa.String(length=1000), nullable=True))
+    op.execute(
+        'UPDATE shorted_url_info SET user_agent = '
+        '(SELECT value FROM user_agent WHERE user_agent.id = shorted_url_info.user_agent_id)'
+    )
+    if op.get_bind().dialect.name == 'postgresql':
+        op.alter_column(
+            'shorted_url_info', 'host',
+            existing_type=postgresql.INET(), type_=sa.String(length=100), postgresql_using='host(host)',
+        )
+    else:
+        _convert_hosts(lambda host: str(ip_address(host)))
+        with op.batch_alter_table('shorted_url_info') as batch_op:
+            batch_op.alter_column(
+                'host', existing_type=sa.LargeBinary(length=16), type_=sa.String(length=100), existing_nullable=False
+            )
+    with op.batch_alter_table('shorted_url_info') as batch_op:
+        batch_op.alter_column('user_agent', existing_type=sa.String(length=1000), nullable=False)
+        batch_op.drop_constraint('fk_shorted_url_info_user_agent_id', type_='foreignkey')
+        batch_op.drop_column('user_agent_id')
+    op.drop_table('user_agent')
@@ -0,0 +1,38 @@
+from fastapi import APIRouter, Depends, Header, HTTPException, Response, status
+
+from src.api.v1.short_url import host_extractor, port_extractor, redirect_to
+from src.db.db import async_session
+from src.services.cache import Link
+from src.services.clicks import click_pipeline
+from src.services.services import short_url_service
+
+router = APIRouter()
+
+
+async def get_link_by_code(*, code: str) -> Link:
+    """Cache hits and recently missed codes are served without the DB"""
+    async with async_session() as db:
+        link = await short_url_service.get_link_by_code(db=db, code=code)
+    if link is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="URL is not found"
+        )
+    return link
+
+
+@router.get("/{code}", status_code=status.HTTP_307_TEMPORARY_REDIRECT)
+async def redirect_short_code(
+    *,
+    host: str = Depends(host_extractor),
+    port: int = Depends(port_extractor),
+    user_agent: str | None = Header(default=None),
+    short_url: Link = Depends(get_link_by_code),
+) -> Response:
+    """Follow the short URL itself & log use"""
+    click_pipeline.enqueue(
+        url_id=short_url.id,
+        host=host,
+        port=port,
+        user_agent=user_agent or "unknown",
+    )
+    return redirect_to(short_url)
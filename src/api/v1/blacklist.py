@@ -5,6 +5,8 @@ from sqlalchemy.ext.asyncio import AsyncSession
 
 from src.db.db import get_session
 from src.schemas.blacklist import BlacklistedClientCreate, BlacklistedClientRead
+from src.services.blacklist import blacklist_index
+from src.services.invalidation import invalidation_broker
 from src.services.services import blacklist_service
 
 router = APIRouter()
@@ -16,10 +18,12 @@ async def blacklist(
     *, db: AsyncSession = Depends(get_session), client: BlacklistedClientCreate
 ) -> BlacklistedClientRead:
     db_object = await blacklist_service.create(db=db, object_in=client)
+    blacklist_index.add(db_object.id, db_object.host, db_object.until)
+    await invalidation_broker.publish("blacklist", db_object.id)
     logger.info(
         "Host %s blacklisted until %s",
         db_object.host,
-        db_object.until.ctime(),
+        db_object.until.ctime() if db_object.until else "forever",
     )
     return db_object
 
@@ -38,4 +42,6 @@ async def remove_from_blacklist(
 ) -> None:
     # ошибки нет, так как SQL не ругается при попытке удалить несуществующий объект
     await blacklist_service.delete(db=db, id=id)
+    blacklist_index.remove(id)
+    await invalidation_broker.publish("blacklist", id)
     logger.info("Host with id %s removed from blacklist", id)
\ No newline at end of file
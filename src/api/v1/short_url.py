@@ -1,20 +1,28 @@
 import logging
+from datetime import datetime
+from typing import Literal
 
 from fastapi import (
     APIRouter,
     Depends,
     Header,
     HTTPException,
+    Query,
     Request,
     Response,
     status,
 )
+from fastapi.responses import StreamingResponse
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from src.db.db import get_session
+from src.db.db import async_session, get_session
+from src.schemas.analytics import (
+    ClickBucket,
+    ClickTopEntry,
+    ShortURLAnalytics,
+)
 from src.schemas.shorted_url_info import (
-   ShortURLInfoCreate,
    ShortURLInfoRead,
    ShortURLInfoReadCut,
 )
@@ -24,8 +32,19 @@ from src.schemas.shorted_url import (
     ShortedURLRead,
     ShortedURLUpdate,
 )
+from src.services.bloom import link_filter
+from src.services.cache import Link
+from src.services.clicks import click_pipeline
+from src.services.export import MEDIA_TYPES, export_clicks
+from src.services.rollups import get_buckets, get_top
+from src.services.base import decode_cursor, encode_cursor
 from src.services.services import short_url_service, url_info_service
-from src.services.shorter import generate_short_url
+from src.services.upload import RequestBodyStreamingResponse, shorten_stream
+from src.services.shorter import (
+    ensure_unique,
+    generate_short_url,
+    short_url_rows,
+)
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
@@ -44,7 +63,9 @@ async def get_short_url(
     db: AsyncSession = Depends(get_session),
     id: int,
 ) -> ShortedURLRead:
-    url_object = await short_url_service.get(db=db, id=id)
+    url_object = None
+    if not link_filter.known_missing(id):
+        url_object = await short_url_service.get(db=db, id=id)
     if url_object is None:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST, detail="URL is not found"
@@ -52,27 +73,43 @@ async def get_short_url(
     return url_object
 
 
+async def get_link(*, id: int) -> Link:
+    """Cache hits and known unknown ids are served without the DB"""
+    async with async_session() as db:
+        link = await short_url_service.get_link(db=db, id=id)
+    if link is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="URL is not found"
+        )
+    return link
+
+
 async def log_url_use(
     *,
-    db: AsyncSession = Depends(get_session),
     host: str = Depends(host_extractor),
     port: int = Depends(port_extractor),
     user_agent: str | None = Header(default=None),
-    short_url: ShortedURLRead = Depends(get_short_url),
-) -> ShortURLInfoRead:
-    url_use_data = ShortURLInfoCreate.parse_obj(
-        {
-            "host": host,
-            "port": port,
-            "user_agent": user_agent or "unknown",
-            "url_id": short_url.id,
-            "user_id": None,
-        }
+    short_url: Link = Depends(get_link),
+) -> bool:
+    """Hand the click over to the background pipeline, never waits on DB"""
+    return click_pipeline.enqueue(
+        url_id=short_url.id,
+        host=host,
+        port=port,
+        user_agent=user_agent or "unknown",
+    )
+
+
+def redirect_to(short_url: Link) -> Response:
+    if short_url.deleted:
+        return Response(status_code=status.HTTP_410_GONE)
+    logger.info("Redirecting to: %s", short_url.original)
+    headers = {"Location": short_url.original}
+    return Response(
+        content="",
+        status_code=status.HTTP_307_TEMPORARY_REDIRECT,
+        headers=headers,
     )
-    db_object = await url_info_service.create(db=db, object_in=url_use_data)
-    info = ShortURLInfoRead.from_orm(db_object)
-    logger.info(f"Logged URL use: {info}")
-    return info
 
 
 @router.post("/shorten", response_model=list[ShortedURLBatchRead])
@@ -81,39 +118,44 @@ async def bulk_create_short_url(
     db: AsyncSession = Depends(get_session),
     urls: list[ShortedURLCreate],
 ) -> list[ShortedURLBatchRead]:
-    objects_in = [
-        {
-            "value": generate_short_url(str(url.original_url)),
-            "original": str(url.original_url),
-        }
-        for url in urls
-    ]
-    db_objects = await short_url_service.bulk_create(
-        db=db, objects_in=objects_in
+    """Existing originals get their stored short URL back"""
+    refs = await short_url_service.bulk_get_or_create(
+        db, [str(url.original_url) for url in urls], generate_short_url
     )
     urls_out = [
-        ShortedURLBatchRead(short_id=obj.id, short_url=obj.value)
-        for obj in db_objects
+        ShortedURLBatchRead(short_id=id, short_url=value)
+        for id, value in refs
     ]
     return urls_out
 
 
+@router.post("/shorten/stream", response_class=RequestBodyStreamingResponse)
+async def stream_bulk_create_short_url(
+    *,
+    request: Request,
+    format: Literal["ndjson", "csv"] | None = None,
+) -> RequestBodyStreamingResponse:
+    """
+    Shorten URLs from an NDJSON ({"original_url": ...} per line) or CSV
+    body read incrementally, results are streamed back as NDJSON
+    """
+    if format is None:
+        content_type = request.headers.get("content-type", "")
+        format = "csv" if "csv" in content_type else "ndjson"
+    return RequestBodyStreamingResponse(
+        shorten_stream(request.stream(), format=format),
+        media_type="application/x-ndjson",
+    )
+
+
 @router.get("/{id}", status_code=status.HTTP_307_TEMPORARY_REDIRECT)
 async def read_short_url(
     *,
-    short_url: ShortedURLRead = Depends(get_short_url),
-    use: ShortURLInfoRead = Depends(log_url_use),
+    short_url: Link = Depends(get_link),
+    logged: bool = Depends(log_url_use),
 ) -> Response:
     """Get URL by ID & log use"""
-    if short_url.deleted:
-        return Response(status_code=status.HTTP_410_GONE)
-    logger.info(f"Redirecting to: {short_url.original}")
-    headers = {"Location": short_url.original}
-    return Response(
-        content="",
-        status_code=status.HTTP_307_TEMPORARY_REDIRECT,
-        headers=headers,
-    )
+    return redirect_to(short_url)
 
 
 @router.delete("/{id}", status_code=status.HTTP_204_NO_CONTENT)
@@ -125,7 +167,9 @@ async def mark_deleted_short_url(
     await short_url_service.update(
         db=db, db_object=short_url, object_in=ShortedURLUpdate(deleted=True)
     )
-    logger.info(f"Mark {short_url.value} ({short_url.original}) as deleted")
+    logger.info(
+        "Mark %s (%s) as deleted", short_url.value, short_url.original
+    )
 
 
 @router.get(
@@ -134,22 +178,103 @@ async def mark_deleted_short_url(
 async def read_short_url_info_history(
     *,
     db: AsyncSession = Depends(get_session),
+    response: Response,
     id: int,
     full_info: bool | None = None,
     offset: int = 0,
-    max_result: int = 10,
+    max_result: int = Query(10, ge=1, le=1000),
+    cursor: str | None = None,
+    since: datetime | None = None,
+    until: datetime | None = None,
 ) -> list[ShortURLInfoRead] | ShortURLInfoReadCut:
+    """
+    Full info is paginated by cursor: pass the X-Next-Cursor header
+    of a page as `cursor` to get the next one
+    """
     if not full_info:
-        url_uses_count = await url_info_service.count(
-            db, filter=dict(url_id=id)
-        )
+        url_uses_count = await short_url_service.get_clicks(db=db, id=id)
         return ShortURLInfoReadCut(count=url_uses_count)
-    url_uses = await url_info_service.get_multi(
-        db=db, filter=dict(url_id=id), skip=offset, limit=max_result
+    if offset:
+        return await url_info_service.get_multi(
+            db=db,
+            filter=dict(url_id=id),
+            since=since,
+            until=until,
+            skip=offset,
+            limit=max_result,
+        )
+    try:
+        after = decode_cursor(cursor) if cursor else None
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor"
+        )
+    url_uses = await url_info_service.get_page(
+        db=db,
+        filter=dict(url_id=id),
+        after=after,
+        since=since,
+        until=until,
+        limit=max_result,
     )
+    if len(url_uses) == max_result:
+        last = url_uses[-1]
+        response.headers["X-Next-Cursor"] = encode_cursor(
+            last.created_at, last.id
+        )
     return url_uses
 
 
+@router.get("/{id}/analytics", response_model=ShortURLAnalytics)
+async def read_short_url_analytics(
+    *,
+    db: AsyncSession = Depends(get_session),
+    id: int,
+    granularity: Literal["minute", "hour", "day"] = "hour",
+    since: datetime | None = None,
+    until: datetime | None = None,
+    top: int = 10,
+) -> ShortURLAnalytics:
+    """Clicks per time bucket and top clients, read from rollups only"""
+    buckets = await get_buckets(
+        db, url_id=id, granularity=granularity, since=since, until=until
+    )
+    user_agents = await get_top(db, url_id=id, kind="user_agent", limit=top)
+    hosts = await get_top(db, url_id=id, kind="host", limit=top)
+    return ShortURLAnalytics(
+        granularity=granularity,
+        buckets=[
+            ClickBucket(bucket=bucket, count=count)
+            for bucket, count in buckets
+        ],
+        top_user_agents=[
+            ClickTopEntry(value=value, count=count)
+            for value, count in user_agents
+        ],
+        top_hosts=[
+            ClickTopEntry(value=value, count=count) for value, count in hosts
+        ],
+    )
+
+
+@router.get("/{id}/export", response_class=StreamingResponse)
+async def export_short_url_info_history(
+    *,
+    id: int,
+    format: Literal["ndjson", "csv"] = "ndjson",
+    since: datetime | None = None,
+    until: datetime | None = None,
+) -> StreamingResponse:
+    """Stream the whole click history as NDJSON or CSV"""
+    return StreamingResponse(
+        export_clicks(url_id=id, format=format, since=since, until=until),
+        media_type=MEDIA_TYPES[format],
+        headers={
+            "Content-Disposition": f'attachment; filename="{id}.{format}"'
+        },
+    )
+
+
 @router.post(
     "/", status_code=status.HTTP_201_CREATED, response_model=ShortedURLRead
 )
@@ -159,10 +284,10 @@ async def create_short_url(
     url: ShortedURLCreate,
 ) -> ShortedURLRead:
     original = str(url.original_url)
-    data = {
-        "value": generate_short_url(original),
-        "original": original,
-    }
+    (value,) = await ensure_unique(
+        db, [original], [generate_short_url(original)]
+    )
+    (data,) = short_url_rows([original], [value])
     try:
         url_object = await short_url_service.create(db=db, object_in=data)
     except IntegrityError:
@@ -0,0 +1,26 @@
+import logging
+
+from fastapi import APIRouter
+
+from src.db.metrics import db_metrics
+from src.schemas.stats import CacheStats, ClickPipelineStats, DBStats
+from src.services.cache import url_cache
+from src.services.clicks import click_pipeline
+
+router = APIRouter()
+logger = logging.getLogger(__name__)
+
+
+@router.get("/stats/cache", response_model=CacheStats)
+async def cache_stats() -> CacheStats:
+    return CacheStats(**url_cache.stats())
+
+
+@router.get("/stats/clicks", response_model=ClickPipelineStats)
+async def click_pipeline_stats() -> ClickPipelineStats:
+    return ClickPipelineStats(**click_pipeline.stats())
+
+
+@router.get("/stats/db", response_model=DBStats)
+async def db_stats() -> DBStats:
+    return DBStats(**db_metrics.stats())
@@ -0,0 +1,352 @@
+"""
+In-process load test of the hot endpoints through the full app
+(middlewares included) over httpx's ASGI transport. Reports p50/p95/p99
+latency and throughput per scenario, saves them as JSON and, given
+a baseline file, exits with 1 when a scenario got slower than the
+tolerance allows.
+
+    PYTHONPATH=src python -m src.benchmarks.load [--requests 500]
+        [--concurrency 1] [--max-clicks 100000]
+        [--scenarios redirect,create,...] [--output results.json]
+        [--baseline previous.json] [--tolerance 0.2]
+
+Runs against ./bench.db unless BENCH_DB points elsewhere (e.g. a
+throwaway Postgres database), tables are created and dropped. PROJECT_DB
+is ignored so a shell set up for a deployment cannot lose its data.
+"""
+import argparse
+import asyncio
+import itertools
+import logging
+import os
+import platform
+import random
+import sys
+import time
+from datetime import datetime
+from ipaddress import IPv4Address
+from typing import Awaitable, Callable
+
+# tables are dropped afterwards, so never pick up the app's PROJECT_DB
+os.environ["PROJECT_DB"] = os.getenv(
+    "BENCH_DB", "sqlite+aiosqlite:///./bench.db"
+)
+
+import orjson  # noqa: E402
+from fastapi import status  # noqa: E402
+from httpx import ASGITransport, AsyncClient, Response  # noqa: E402
+
+from src.benchmarks.seed import seed_clicks  # noqa: E402
+from src.core.config import app_settings  # noqa: E402
+from src.db.db import Base, async_session, engine  # noqa: E402
+from src.main import app  # noqa: E402
+from src.models.models import ShortedURL  # noqa: E402
+from src.services.blacklist import blacklist_index  # noqa: E402
+from src.services.cache import url_cache  # noqa: E402
+from src.services.clicks import click_pipeline  # noqa: E402
+from src.services.ratelimit import rate_limiter  # noqa: E402
+
+CLIENT_IP = "198.51.100.7"
+
+# called with the request number, returns the response to check
+Request = Callable[[AsyncClient, int], Awaitable[Response]]
+
+
+def percentile(sorted_values: list[float], fraction: float) -> float:
+    """Nearest-rank percentile of an ascending list"""
+    rank = round(fraction * len(sorted_values))
+    return sorted_values[max(0, min(len(sorted_values), rank) - 1)]
+
+
+async def measure(
+    request: Request,
+    requests: int,
+    concurrency: int,
+    expected: int,
+    items: int = 1,
+    setup: Callable[[], None] | None = None,
+) -> dict[str, float]:
+    """Latencies of `requests` calls spread over `concurrency` clients"""
+    transport = ASGITransport(app=app, client=(CLIENT_IP, 123))
+    latencies: list[float] = []
+    numbers = itertools.count()
+    async with AsyncClient(transport=transport, base_url="http://b") as client:
+        for number in range(min(20, requests)):
+            await request(client, -number - 1)
+
+        async def worker() -> None:
+            for number in numbers:
+                if number >= requests:
+                    return
+                if setup is not None:
+                    setup()
+                started = time.perf_counter()
+                response = await request(client, number)
+                latencies.append(time.perf_counter() - started)
+                if response.status_code != expected:
+                    raise RuntimeError(
+                        f"Unexpected {response.status_code}: {response.text}"
+                    )
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "requests": requests,
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p95_ms": percentile(latencies, 0.95) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+        "rps": requests / elapsed,
+        "items_per_s": requests * items / elapsed,
+    }
+
+
+async def seed_link(clicks: int = 0) -> int:
+    """One short URL with `clicks` rows of history"""
+    async with async_session() as db:
+        url = ShortedURL(
+            value=f"http://b/seed{clicks}-{random.getrandbits(32)}",
+            original=f"https://example.com/{random.getrandbits(64)}",
+        )
+        db.add(url)
+        await db.commit()
+        if clicks:
+            await seed_clicks(db, [url.id], clicks)
+    return url.id
+
+
+def fill_blacklist(entries: int) -> None:
+    """Random /24../32 networks outside the client's own /8"""
+    blacklist_index.clear()
+    for id in range(entries):
+        address = IPv4Address(random.randrange(1 << 24, 198 << 24))
+        prefix = random.choice((24, 28, 32))
+        blacklist_index.add(id, f"{address}/{prefix}")
+
+
+async def redirect(options) -> dict[str, dict[str, float]]:
+    id = await seed_link()
+    path = f"/api/v1/{id}"
+
+    async def request(client: AsyncClient, number: int) -> Response:
+        return await client.get(path)
+
+    expected = status.HTTP_307_TEMPORARY_REDIRECT
+    return {
+        "redirect_cached": await measure(
+            request, options.requests, options.concurrency, expected
+        ),
+        "redirect_uncached": await measure(
+            request,
+            options.requests,
+            options.concurrency,
+            expected,
+            setup=url_cache.clear,
+        ),
+    }
+
+
+async def create(options) -> dict[str, dict[str, float]]:
+    run = random.getrandbits(32)
+
+    async def request(client: AsyncClient, number: int) -> Response:
+        return await client.post(
+            "/api/v1/",
+            json={"original_url": f"https://create.com/{run}/{number}"},
+        )
+
+    return {
+        "create": await measure(
+            request,
+            options.requests,
+            options.concurrency,
+            status.HTTP_201_CREATED,
+        )
+    }
+
+
+async def bulk_create(options) -> dict[str, dict[str, float]]:
+    results = {}
+    for size in (10, 100, 1000):
+        run = random.getrandbits(32)
+
+        async def request(client: AsyncClient, number: int) -> Response:
+            return await client.post(
+                "/api/v1/shorten",
+                json=[
+                    {"original_url": f"https://bulk.com/{run}/{number}/{i}"}
+                    for i in range(size)
+                ],
+            )
+
+        results[f"bulk_create_{size}"] = await measure(
+            request,
+            max(10, options.requests // size * 10),
+            options.concurrency,
+            status.HTTP_200_OK,
+            items=size,
+        )
+    return results
+
+
+async def status_history(options) -> dict[str, dict[str, float]]:
+    results = {}
+    clicks = 1000
+    while clicks <= options.max_clicks:
+        id = await seed_link(clicks)
+
+        async def count(client: AsyncClient, number: int) -> Response:
+            return await client.get(f"/api/v1/{id}/status")
+
+        async def page(client: AsyncClient, number: int) -> Response:
+            return await client.get(
+                f"/api/v1/{id}/status", params={"full_info": True}
+            )
+
+        for name, request in (("count", count), ("page", page)):
+            results[f"status_{name}_{clicks}"] = await measure(
+                request,
+                options.requests,
+                options.concurrency,
+                status.HTTP_200_OK,
+            )
+        clicks *= 10
+    return results
+
+
+async def blacklist(options) -> dict[str, dict[str, float]]:
+    id = await seed_link()
+    path = f"/api/v1/{id}"
+
+    async def request(client: AsyncClient, number: int) -> Response:
+        return await client.get(path)
+
+    results = {}
+    try:
+        for entries in (0, 1000, 100000):
+            fill_blacklist(entries)
+            results[f"blacklist_{entries}"] = await measure(
+                request,
+                options.requests,
+                options.concurrency,
+                status.HTTP_307_TEMPORARY_REDIRECT,
+            )
+    finally:
+        blacklist_index.clear()
+    return results
+
+
+SCENARIOS = {
+    "redirect": redirect,
+    "create": create,
+    "bulk_create": bulk_create,
+    "status": status_history,
+    "blacklist": blacklist,
+}
+
+
+def regressions(
+    results: dict[str, dict[str, float]],
+    baseline: dict[str, dict[str, float]],
+    tolerance: float,
+) -> list[str]:
+    failed = []
+    for name, result in results.items():
+        before = baseline.get(name)
+        if before is None:
+            continue
+        if result["p95_ms"] > before["p95_ms"] * (1 + tolerance):
+            failed.append(
+                f"{name}: p95 {before['p95_ms']:.2f} -> "
+                f"{result['p95_ms']:.2f} ms"
+            )
+        if result["rps"] < before["rps"] * (1 - tolerance):
+            failed.append(
+                f"{name}: {before['rps']:.1f} -> {result['rps']:.1f} req/s"
+            )
+    return failed
+
+
+def report(results: dict[str, dict[str, float]]) -> None:
+    print(
+        f"{'scenario':<24}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"
+        f"{'req/s':>10}{'items/s':>12}"
+    )
+    for name, result in results.items():
+        print(
+            f"{name:<24}{result['p50_ms']:>10.2f}{result['p95_ms']:>10.2f}"
+            f"{result['p99_ms']:>10.2f}{result['rps']:>10.1f}"
+            f"{result['items_per_s']:>12.1f}"
+        )
+
+
+async def run(options) -> dict[str, dict[str, float]]:
+    logging.disable(logging.WARNING)
+    # the suite hammers one client on purpose
+    rate_limiter.rules = {}
+    async with engine.begin() as connection:
+        await connection.run_sync(Base.metadata.create_all)
+    results = {}
+    try:
+        for name in options.scenarios:
+            results.update(await SCENARIOS[name](options))
+            await click_pipeline.flush()
+    finally:
+        async with engine.begin() as connection:
+            await connection.run_sync(Base.metadata.drop_all)
+        await engine.dispose()
+    return results
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--max-clicks", type=int, default=100000)
+    parser.add_argument(
+        "--scenarios",
+        type=lambda value: value.split(","),
+        default=list(SCENARIOS),
+    )
+    parser.add_argument("--output", default="load-results.json")
+    parser.add_argument("--baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    options = parser.parse_args()
+    unknown = set(options.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+
+    results = asyncio.run(run(options))
+    report(results)
+    with open(options.output, "wb") as output:
+        output.write(
+            orjson.dumps(
+                {
+                    "meta": {
+                        "created_at": datetime.now().isoformat(),
+                        "db": app_settings.project_db.split(":", 1)[0],
+                        "python": platform.python_version(),
+                        "requests": options.requests,
+                        "concurrency": options.concurrency,
+                    },
+                    "scenarios": results,
+                },
+                option=orjson.OPT_INDENT_2,
+            )
+        )
+    if options.baseline:
+        with open(options.baseline, "rb") as baseline:
+            failed = regressions(
+                results,
+                orjson.loads(baseline.read())["scenarios"],
+                options.tolerance,
+            )
+        if failed:
+            print("Regressions over tolerance:", *failed, sep="\n  ")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
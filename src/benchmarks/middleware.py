@@ -0,0 +1,90 @@
+"""
+Redirect throughput behind the blacklist check implemented as
+Starlette's BaseHTTPMiddleware (before) and as pure ASGI (after).
+
+    python -m src.benchmarks.middleware [requests]
+
+Uses ./bench.db or BENCH_DB, never PROJECT_DB: tables are dropped.
+"""
+import asyncio
+import logging
+import os
+import sys
+import time
+
+# tables are dropped afterwards, so never pick up the app's PROJECT_DB
+os.environ["PROJECT_DB"] = os.getenv(
+    "BENCH_DB", "sqlite+aiosqlite:///./bench.db"
+)
+
+from fastapi import FastAPI, Request, status  # noqa: E402
+from fastapi.responses import JSONResponse, ORJSONResponse  # noqa: E402
+from httpx import ASGITransport, AsyncClient  # noqa: E402
+from starlette.middleware.base import BaseHTTPMiddleware  # noqa: E402
+
+from src.api.v1.base import api_router  # noqa: E402
+from src.db.db import Base, async_session, engine  # noqa: E402
+from src.middlewares.blacklist_middleware import (  # noqa: E402
+    BlacklistMiddleware,
+)
+from src.models.models import ShortedURL  # noqa: E402
+from src.services.blacklist import blacklist_index  # noqa: E402
+
+
+class LegacyBlacklistMiddleware(BaseHTTPMiddleware):
+    async def dispatch(self, request: Request, call_next):
+        if blacklist_index.contains(request.client.host):
+            return JSONResponse(
+                status_code=status.HTTP_403_FORBIDDEN,
+                content={"detail": "You`ve been temporary blacklisted"},
+            )
+        return await call_next(request)
+
+
+def build_app(middleware) -> FastAPI:
+    app = FastAPI(default_response_class=ORJSONResponse)
+    app.include_router(api_router, prefix="/api/v1")
+    app.add_middleware(middleware)
+    return app
+
+
+async def requests_per_second(app: FastAPI, path: str, requests: int) -> float:
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://b") as client:
+        for _ in range(100):
+            await client.get(path)
+        started = time.perf_counter()
+        for _ in range(requests):
+            response = await client.get(path)
+        elapsed = time.perf_counter() - started
+    assert response.status_code == status.HTTP_307_TEMPORARY_REDIRECT
+    return requests / elapsed
+
+
+async def main(requests: int) -> None:
+    logging.disable(logging.INFO)
+    async with engine.begin() as connection:
+        await connection.run_sync(Base.metadata.create_all)
+    async with async_session() as db:
+        url = ShortedURL(value="http://b/x", original="https://example.com/")
+        db.add(url)
+        await db.commit()
+    try:
+        path = f"/api/v1/{url.id}"
+        before = await requests_per_second(
+            build_app(LegacyBlacklistMiddleware), path, requests
+        )
+        after = await requests_per_second(
+            build_app(BlacklistMiddleware), path, requests
+        )
+        print(f"BaseHTTPMiddleware: {before:10.1f} req/s")
+        print(f"pure ASGI:          {after:10.1f} req/s")
+        print(f"speedup:            {after / before:10.2f}x")
+    finally:
+        async with engine.begin() as connection:
+            await connection.run_sync(Base.metadata.drop_all)
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 2000))
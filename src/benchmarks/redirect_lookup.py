@@ -0,0 +1,69 @@
+"""
+CPU cost of resolving a short URL on a cache miss: ORM entity load plus
+ShortedURLRead validation (before) against the Core two-column lookup.
+
+    python -m src.benchmarks.redirect_lookup [iterations]
+
+Uses ./bench.db or BENCH_DB, never PROJECT_DB: tables are dropped.
+"""
+import asyncio
+import os
+import sys
+import time
+
+# tables are dropped afterwards, so never pick up the app's PROJECT_DB
+os.environ["PROJECT_DB"] = os.getenv(
+    "BENCH_DB", "sqlite+aiosqlite:///./bench.db"
+)
+
+from src.db.db import Base, async_session, engine  # noqa: E402
+from src.models.models import ShortedURL  # noqa: E402
+from src.schemas.shorted_url import ShortedURLRead  # noqa: E402
+from src.services.services import short_url_service  # noqa: E402
+
+
+async def orm_lookup(id: int) -> tuple[str, bool]:
+    async with async_session() as db:
+        url = ShortedURLRead.model_validate(
+            await short_url_service.get(db=db, id=id)
+        )
+    return str(url.original), url.deleted
+
+
+async def lean_lookup(id: int) -> tuple[str, bool]:
+    async with async_session() as db:
+        return await short_url_service.lookup(db=db, id=id)
+
+
+async def cpu_per_call(lookup, id: int, iterations: int) -> float:
+    for _ in range(100):
+        await lookup(id)
+    started = time.process_time()
+    for _ in range(iterations):
+        await lookup(id)
+    return (time.process_time() - started) / iterations
+
+
+async def main(iterations: int) -> None:
+    async with engine.begin() as connection:
+        await connection.run_sync(Base.metadata.create_all)
+    async with async_session() as db:
+        url = ShortedURL(
+            value="http://b/x", original="https://example.com/", deleted=False
+        )
+        db.add(url)
+        await db.commit()
+    try:
+        before = await cpu_per_call(orm_lookup, url.id, iterations)
+        after = await cpu_per_call(lean_lookup, url.id, iterations)
+        print(f"ORM + pydantic: {before * 1e6:8.1f} us CPU per lookup")
+        print(f"Core row:       {after * 1e6:8.1f} us CPU per lookup")
+        print(f"saved:          {(before - after) * 1e6:8.1f} us")
+    finally:
+        async with engine.begin() as connection:
+            await connection.run_sync(Base.metadata.drop_all)
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 2000))
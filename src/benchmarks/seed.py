@@ -0,0 +1,222 @@
+"""
+Bulk seeding of synthetic links and click histories. Link popularity
+follows a Zipf law (the k-th most popular link gets clicks in
+proportion to 1 / k**s), attribute values come from the test factories.
+Clicks go in with COPY on asyncpg and multi-row INSERTs elsewhere.
+
+    PYTHONPATH=src python -m src.benchmarks.seed [--links 10000]
+        [--clicks 1000000] [--zipf 1.1] [--days 30]
+        [--chunk-size 10000] [--random-seed 42] [--rollups]
+
+Writes to PROJECT_DB, ./bench.db by default, creating missing tables.
+"""
+import argparse
+import asyncio
+import itertools
+import logging
+import os
+import random
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Any
+
+os.environ.setdefault("PROJECT_DB", "sqlite+aiosqlite:///./bench.db")
+
+import factory  # noqa: E402
+from sqlalchemy import bindparam, insert, update  # noqa: E402
+from sqlalchemy.ext.asyncio import AsyncSession  # noqa: E402
+
+from src.db.db import Base, async_session, engine  # noqa: E402
+from src.models.models import ShortedURL, ShortedURLInfo  # noqa: E402
+from src.services.rollups import click_rollup  # noqa: E402
+from src.services.services import short_url_service  # noqa: E402
+from src.services.shorter import generate_short_url  # noqa: E402
+from src.services.user_agents import user_agents  # noqa: E402
+from src.tests.factories import (  # noqa: E402
+    ShortedURLFactory,
+    ShortedURLInfoFactory,
+)
+
+logger = logging.getLogger(__name__)
+
+CLICK_COLUMNS = ("url_id", "host", "port", "user_agent_id", "created_at")
+# distinct clients drawn from the factories, reused across clicks
+CLIENT_POOL_SIZE = 1000
+
+_info = ShortedURLInfo.__table__
+_shorted_url = ShortedURL.__table__
+_bump_clicks = (
+    update(_shorted_url)
+    .where(_shorted_url.c.id == bindparam("url_id_"))
+    .values(clicks=_shorted_url.c.clicks + bindparam("clicks_"))
+)
+
+
+def zipf_weights(count: int, s: float) -> list[float]:
+    """Cumulative weights of ranks 1..count for random.choices"""
+    return list(
+        itertools.accumulate(1 / rank**s for rank in range(1, count + 1))
+    )
+
+
+def client_pool(size: int = CLIENT_POOL_SIZE) -> list[dict[str, Any]]:
+    return [
+        factory.build(dict, FACTORY_CLASS=ShortedURLInfoFactory, url_id=None)
+        for _ in range(size)
+    ]
+
+
+async def bulk_load(
+    db: AsyncSession, rows: list[tuple], columns=CLICK_COLUMNS
+) -> None:
+    """COPY into shorted_url_info on asyncpg, one multi-row INSERT else"""
+    connection = await db.connection()
+    if connection.dialect.driver == "asyncpg":
+        raw = await connection.get_raw_connection()
+        await raw.driver_connection.copy_records_to_table(
+            _info.name, records=rows, columns=list(columns)
+        )
+        return
+    await db.execute(insert(_info), [dict(zip(columns, row)) for row in rows])
+
+
+async def seed_links(
+    db: AsyncSession, links: int, chunk_size: int = 10000
+) -> list[int]:
+    """Ids of `links` new short URLs stored the way POST /shorten does"""
+    run = random.getrandbits(32)
+    originals = [
+        "{}{}/{}".format(
+            factory.build(dict, FACTORY_CLASS=ShortedURLFactory)["original"],
+            run,
+            number,
+        )
+        for number in range(links)
+    ]
+    refs = await short_url_service.bulk_get_or_create(
+        db, originals, generate_short_url, chunk_size=chunk_size
+    )
+    return [id for id, _ in refs]
+
+
+async def seed_clicks(
+    db: AsyncSession,
+    url_ids: list[int],
+    clicks: int,
+    *,
+    zipf: float = 1.1,
+    since: datetime | None = None,
+    until: datetime | None = None,
+    chunk_size: int = 10000,
+) -> Counter:
+    """
+    `clicks` history rows spread over url_ids by Zipf popularity in
+    their list order, also bumps their click counters.
+    Returns clicks per url id.
+    """
+    until = until or datetime.utcnow()
+    since = since or until - timedelta(days=30)
+    span = (until - since).total_seconds()
+    weights = zipf_weights(len(url_ids), zipf)
+    clients = client_pool()
+    agent_ids = await user_agents.intern(
+        client["user_agent"] for client in clients
+    )
+    counts: Counter = Counter()
+    for offset in range(0, clicks, chunk_size):
+        size = min(chunk_size, clicks - offset)
+        rows = []
+        for url_id in random.choices(url_ids, cum_weights=weights, k=size):
+            client = random.choice(clients)
+            rows.append(
+                (
+                    url_id,
+                    client["host"],
+                    client["port"],
+                    agent_ids[client["user_agent"]],
+                    since + timedelta(seconds=random.random() * span),
+                )
+            )
+            counts[url_id] += 1
+        await bulk_load(db, rows)
+        await db.commit()
+    for offset in range(0, len(counts), chunk_size):
+        await db.execute(
+            _bump_clicks,
+            [
+                {"url_id_": url_id, "clicks_": count}
+                for url_id, count in itertools.islice(
+                    counts.items(), offset, offset + chunk_size
+                )
+            ],
+        )
+    await db.commit()
+    return counts
+
+
+async def seed(
+    links: int,
+    clicks: int,
+    *,
+    zipf: float = 1.1,
+    days: float = 30,
+    chunk_size: int = 10000,
+    rollups: bool = False,
+) -> list[int]:
+    """Links with click histories, returns ids from most to least popular"""
+    async with engine.begin() as connection:
+        await connection.run_sync(Base.metadata.create_all)
+    async with async_session() as db:
+        url_ids = await seed_links(db, links, chunk_size)
+        # popularity must not follow insertion order
+        random.shuffle(url_ids)
+        until = datetime.utcnow()
+        await seed_clicks(
+            db,
+            url_ids,
+            clicks,
+            zipf=zipf,
+            since=until - timedelta(days=days),
+            until=until,
+            chunk_size=chunk_size,
+        )
+    if rollups:
+        await click_rollup.catch_up()
+    return url_ids
+
+
+async def main(options) -> None:
+    if options.random_seed is not None:
+        random.seed(options.random_seed)
+    started = time.perf_counter()
+    try:
+        url_ids = await seed(
+            options.links,
+            options.clicks,
+            zipf=options.zipf,
+            days=options.days,
+            chunk_size=options.chunk_size,
+            rollups=options.rollups,
+        )
+    finally:
+        await engine.dispose()
+    elapsed = time.perf_counter() - started
+    print(
+        f"{len(url_ids)} links, {options.clicks} clicks in {elapsed:.1f} s"
+        f" ({options.clicks / elapsed:.0f} clicks/s),"
+        f" most popular id {url_ids[0] if url_ids else None}"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--links", type=int, default=10000)
+    parser.add_argument("--clicks", type=int, default=1000000)
+    parser.add_argument("--zipf", type=float, default=1.1)
+    parser.add_argument("--days", type=float, default=30)
+    parser.add_argument("--chunk-size", type=int, default=10000)
+    parser.add_argument("--random-seed", type=int)
+    parser.add_argument("--rollups", action="store_true")
+    logging.disable(logging.INFO)
+    asyncio.run(main(parser.parse_args()))
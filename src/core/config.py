@@ -2,19 +2,154 @@ from os import getenv
 from dotenv import load_dotenv
 from pydantic import PostgresDsn, HttpUrl
 from pydantic_settings import BaseSettings
-from src.core.logger import LOGGING
-from logging import config as logging_config
+from src.core.logger import configure_logging, parse_sample_rates
 
 load_dotenv()
-logging_config.dictConfig(LOGGING)
 
 
 class AppSettings(BaseSettings):
     project_name: str = getenv("PROJECT_NAME", "Url-shorter")
     project_host: str | HttpUrl = getenv("PROJECT_HOST", "localhost")
     project_port: int = getenv("PROJECT_PORT", "8080")
+    # server.py workers, 0 runs one per CPU
+    project_workers: int = getenv("PROJECT_WORKERS", "0")
+    project_access_log: bool = getenv("PROJECT_ACCESS_LOG", "false")
+    project_backlog: int = getenv("PROJECT_BACKLOG", "2048")
+    project_keep_alive: int = getenv("PROJECT_KEEP_ALIVE", "5")
+    # seconds to finish requests and flush background writes on shutdown
+    project_graceful_timeout: int = getenv("PROJECT_GRACEFUL_TIMEOUT", "30")
+    # on startup open the pool and load the most clicked links
+    project_warmup: bool = getenv("PROJECT_WARMUP", "true")
+    project_warmup_links: int = getenv("PROJECT_WARMUP_LINKS", "1000")
+    # plain: synchronous handlers, queue: JSON records written from
+    # a background thread, INFO and below sampled per logger
+    project_log_mode: str = getenv("PROJECT_LOG_MODE", "plain")
+    project_log_sample_rates: str = getenv(
+        "PROJECT_LOG_SAMPLE_RATES",
+        "api.v1.short_url=0.01,services.shorter=0.01",
+    )
     project_db: str = getenv("PROJECT_DB", "")
-    project_shortener: str = getenv("PROJECT_SHORTENER", "clckru")
+    project_db_echo: bool = getenv("PROJECT_DB_ECHO", "false")
+    project_db_pool_size: int = getenv("PROJECT_DB_POOL_SIZE", "10")
+    project_db_max_overflow: int = getenv("PROJECT_DB_MAX_OVERFLOW", "20")
+    project_db_pool_timeout: float = getenv("PROJECT_DB_POOL_TIMEOUT", "30")
+    # seconds before a pooled connection is replaced, -1 keeps it forever
+    project_db_pool_recycle: int = getenv("PROJECT_DB_POOL_RECYCLE", "1800")
+    project_db_pool_pre_ping: bool = getenv(
+        "PROJECT_DB_POOL_PRE_PING", "false"
+    )
+    # asyncpg prepared statement cache, 0 for pgbouncer transaction mode
+    project_db_statement_cache_size: int = getenv(
+        "PROJECT_DB_STATEMENT_CACHE_SIZE", "100"
+    )
+    # sequence, random, hash or any pyshorteners service name (clckru, ...)
+    project_shortener: str = getenv("PROJECT_SHORTENER", "sequence")
+    project_short_url_base: str = getenv(
+        "PROJECT_SHORT_URL_BASE", "http://localhost:8080/"
+    )
+    project_short_code_alphabet: str = getenv(
+        "PROJECT_SHORT_CODE_ALPHABET",
+        "0123456789abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ",
+    )
+    project_short_code_length: int = getenv("PROJECT_SHORT_CODE_LENGTH", "7")
+    # first sequence worker id of this host, 0..63, hosts sharing a
+    # database need disjoint ranges
+    project_code_worker_base: int = getenv("PROJECT_CODE_WORKER_BASE", "0")
+    # redirect cache, size 0 disables it, ttl in seconds
+    project_url_cache_size: int = getenv("PROJECT_URL_CACHE_SIZE", "10000")
+    project_url_cache_ttl: float = getenv("PROJECT_URL_CACHE_TTL", "300")
+    # interned user agents kept in process, per direction
+    project_user_agent_cache_size: int = getenv(
+        "PROJECT_USER_AGENT_CACHE_SIZE", "10000"
+    )
+    # seconds between blacklist index reloads, 0 disables polling
+    project_blacklist_refresh_interval: float = getenv(
+        "PROJECT_BLACKLIST_REFRESH_INTERVAL", "30"
+    )
+    # seconds between bulk deletes of expired blacklist rows
+    project_blacklist_purge_interval: float = getenv(
+        "PROJECT_BLACKLIST_PURGE_INTERVAL", "300"
+    )
+    # click rollups for analytics, interval in seconds, 0 disables worker
+    project_rollup_interval: float = getenv("PROJECT_ROLLUP_INTERVAL", "10")
+    project_rollup_batch_size: int = getenv(
+        "PROJECT_ROLLUP_BATCH_SIZE", "10000"
+    )
+    # seconds a gap in click ids may stay open before it is skipped
+    project_rollup_settle: float = getenv("PROJECT_ROLLUP_SETTLE", "60")
+    # filter of existing ids answering unknown ones without the DB,
+    # refresh in seconds, 0 leaves only the short lived miss cache
+    project_link_filter_capacity: int = getenv(
+        "PROJECT_LINK_FILTER_CAPACITY", "1000000"
+    )
+    project_link_filter_error_rate: float = getenv(
+        "PROJECT_LINK_FILTER_ERROR_RATE", "0.01"
+    )
+    project_link_filter_refresh_interval: float = getenv(
+        "PROJECT_LINK_FILTER_REFRESH_INTERVAL", "60"
+    )
+    project_link_miss_cache_size: int = getenv(
+        "PROJECT_LINK_MISS_CACHE_SIZE", "10000"
+    )
+    project_link_miss_ttl: float = getenv("PROJECT_LINK_MISS_TTL", "5")
+    # per client token buckets as "<requests>/<seconds>" (e.g. 60/60),
+    # off unless set, empty or 0 disables, ban_after rejections in a row
+    # blacklist the client, 0 never bans
+    project_rate_limit_create: str = getenv("PROJECT_RATE_LIMIT_CREATE", "0")
+    project_rate_limit_shorten: str = getenv(
+        "PROJECT_RATE_LIMIT_SHORTEN", "0"
+    )
+    project_rate_limit_redirect: str = getenv(
+        "PROJECT_RATE_LIMIT_REDIRECT", "0"
+    )
+    project_rate_limit_max_buckets: int = getenv(
+        "PROJECT_RATE_LIMIT_MAX_BUCKETS", "100000"
+    )
+    project_rate_limit_ban_after: int = getenv(
+        "PROJECT_RATE_LIMIT_BAN_AFTER", "0"
+    )
+    project_rate_limit_ban_seconds: float = getenv(
+        "PROJECT_RATE_LIMIT_BAN_SECONDS", "600"
+    )
+    # how workers tell each other about deleted links and blacklist
+    # changes: local (single worker), shm (one host) or a redis:// URL,
+    # polled every interval seconds
+    project_invalidation_backend: str = getenv(
+        "PROJECT_INVALIDATION_BACKEND", "local"
+    )
+    project_invalidation_interval: float = getenv(
+        "PROJECT_INVALIDATION_INTERVAL", "0.5"
+    )
+    # shm ring buffer file, defaults to /dev/shm/urlshorter-invalidations
+    project_invalidation_path: str = getenv("PROJECT_INVALIDATION_PATH", "")
+    project_invalidation_slots: int = getenv(
+        "PROJECT_INVALIDATION_SLOTS", "4096"
+    )
+    # months of click history kept besides the current one, 0 keeps all,
+    # expired months are archived to the dir as NDJSON.gz if it is set
+    project_click_retention_months: int = getenv(
+        "PROJECT_CLICK_RETENTION_MONTHS", "0"
+    )
+    project_click_archive_dir: str = getenv("PROJECT_CLICK_ARCHIVE_DIR", "")
+    # monthly Postgres partitions created in advance, check in seconds
+    project_partition_ahead_months: int = getenv(
+        "PROJECT_PARTITION_AHEAD_MONTHS", "2"
+    )
+    project_partition_interval: float = getenv(
+        "PROJECT_PARTITION_INTERVAL", "3600"
+    )
+    # background click logging, flush interval in seconds
+    project_click_queue_size: int = getenv(
+        "PROJECT_CLICK_QUEUE_SIZE", "100000"
+    )
+    project_click_batch_size: int = getenv("PROJECT_CLICK_BATCH_SIZE", "500")
+    project_click_flush_interval: float = getenv(
+        "PROJECT_CLICK_FLUSH_INTERVAL", "1"
+    )
 
 
 app_settings = AppSettings()
+configure_logging(
+    app_settings.project_log_mode,
+    parse_sample_rates(app_settings.project_log_sample_rates),
+)
@@ -1,3 +1,13 @@
+import copy
+import logging
+import queue
+import random
+from datetime import datetime, timezone
+from logging.config import dictConfig
+from logging.handlers import QueueHandler, QueueListener
+
+import orjson
+
 LOG_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
 LOG_DEFAULT_HANDLERS = [
     "console",
@@ -56,4 +66,142 @@ LOGGING = {
         "formatter": "verbose",
         "handlers": LOG_DEFAULT_HANDLERS,
     },
-}
\ No newline at end of file
+}
+
+
+# LogRecord attributes, anything else came in through extra=
+_RECORD_ATTRIBUTES = set(vars(logging.makeLogRecord({}))) | {
+    "message",
+    "asctime",
+    "color_message",
+}
+
+
+class JSONFormatter(logging.Formatter):
+    """One orjson encoded object per record, extra= fields included"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRIBUTES:
+                entry[key] = value
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        if record.stack_info:
+            entry["stack_info"] = self.formatStack(record.stack_info)
+        return orjson.dumps(entry, default=str).decode()
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Lets through a `rate` share of the records under WARNING coming
+    from the given loggers or their children, picked at random. Names
+    match with or without the src. prefix, as modules are imported
+    both ways.
+    """
+
+    def __init__(self, rates: dict[str, float]):
+        super().__init__()
+        self.rates = rates
+        self._resolved: dict[str, float] = {}
+        self.dropped = 0
+
+    def rate(self, name: str) -> float:
+        rate = self._resolved.get(name)
+        if rate is None:
+            rate = 1.0
+            part = name.removeprefix("src.")
+            while part:
+                if part in self.rates:
+                    rate = self.rates[part]
+                    break
+                part = part.rpartition(".")[0]
+            self._resolved[name] = rate
+        return rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        rate = self.rate(record.name)
+        if rate >= 1 or random.random() < rate:
+            return True
+        self.dropped += 1
+        return False
+
+
+class QueueLogHandler(QueueHandler):
+    """
+    Puts records on an unbounded queue drained by a listener thread
+    that formats them and writes through `handlers`, so the logging
+    call never waits on I/O. Records are passed as they are: messages
+    are only built in the listener, arguments must not be mutated
+    after the call.
+    """
+
+    def __init__(self, handlers: list[logging.Handler]):
+        super().__init__(queue.SimpleQueue())
+        self.listener = QueueListener(
+            self.queue, *handlers, respect_handler_level=True
+        )
+        self.listener.start()
+        self._stopped = False
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+    def close(self) -> None:
+        """Stop the listener once everything queued is written"""
+        if not self._stopped:
+            self._stopped = True
+            self.listener.stop()
+        super().close()
+
+
+def parse_sample_rates(value: str) -> dict[str, float]:
+    """'logger=rate,...' as in PROJECT_LOG_SAMPLE_RATES"""
+    rates = {}
+    for item in filter(None, value.split(",")):
+        name, _, rate = item.partition("=")
+        rates[name.strip()] = float(rate)
+    return rates
+
+
+def configure_logging(
+    mode: str = "plain", sample_rates: dict[str, float] | None = None
+) -> None:
+    """
+    plain: LOGGING as is, handlers write synchronously. queue: the same
+    destinations written from listener threads as JSON, with hot-path
+    loggers sampled. SQLAlchemy echo goes through the queue as well
+    instead of its own stdout handler.
+    """
+    if mode == "plain":
+        dictConfig(LOGGING)
+        return
+    if mode != "queue":
+        raise RuntimeError(f"Unknown log mode {mode}")
+    config = copy.deepcopy(LOGGING)
+    config["formatters"]["json"] = {"()": JSONFormatter}
+    for handler in config["handlers"].values():
+        handler["formatter"] = "json"
+    config["loggers"]["sqlalchemy.engine.Engine"] = {
+        "handlers": LOG_DEFAULT_HANDLERS,
+        "propagate": False,
+    }
+    dictConfig(config)
+    sampling = SamplingFilter(sample_rates or {})
+    queued: dict[tuple[int, ...], QueueLogHandler] = {}
+    loggers = {logging.getLogger(name) for name in config["loggers"]}
+    for logger in loggers | {logging.getLogger()}:
+        if not logger.handlers:
+            continue
+        key = tuple(map(id, logger.handlers))
+        if key not in queued:
+            queued[key] = QueueLogHandler(logger.handlers)
+            queued[key].addFilter(sampling)
+        logger.handlers = [queued[key]]
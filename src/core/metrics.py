@@ -0,0 +1,166 @@
+from bisect import bisect_left
+from typing import Callable, Iterable
+
+LabelValues = tuple[str, ...]
+# (name, type, help, [(label values, value)]) of one collected family
+Family = tuple[str, str, str, list[tuple[dict[str, str], float]]]
+
+DEFAULT_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10
+)
+
+
+def _escape(value: str) -> str:
+    return (
+        value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+    )
+
+
+def _labels(names: Iterable[str], values: Iterable[str]) -> str:
+    pairs = ",".join(
+        f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)
+    )
+    return f"{{{pairs}}}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class Counter:
+    type = "counter"
+
+    def __init__(self, name: str, help: str, labels: Iterable[str] = ()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values: dict[LabelValues, float] = {}
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self) -> list[str]:
+        return [
+            f"{self.name}{_labels(self.labels, key)} {_number(value)}"
+            for key, value in self._values.items()
+        ]
+
+
+class Histogram:
+    type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labels: Iterable[str] = (),
+        buckets: Iterable[float] = DEFAULT_BUCKETS,
+    ):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        # label values -> [per bucket counts..., +Inf count, sum]
+        self._values: dict[LabelValues, list[float]] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        series = self._values.get(labels)
+        if series is None:
+            series = self._values[labels] = [0] * (len(self.buckets) + 2)
+        series[bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def render(self) -> list[str]:
+        lines = []
+        names = self.labels + ("le",)
+        for key, series in self._values.items():
+            cumulative = 0
+            for bound, count in zip(
+                self.buckets + (float("inf"),), series[:-1]
+            ):
+                cumulative += count
+                lines.append(
+                    f"{self.name}_bucket"
+                    f"{_labels(names, key + (_number(bound),))} {cumulative}"
+                )
+            labels = _labels(self.labels, key)
+            lines.append(f"{self.name}_sum{labels} {_number(series[-1])}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    """
+    Process-wide metrics in Prometheus text exposition format.
+    Hot paths update counters and histograms directly, subsystems that
+    already keep their own stats register a collector called on scrape.
+    """
+
+    def __init__(self, prefix: str = "urlshorter"):
+        self.prefix = prefix
+        self._metrics: dict[str, Counter | Histogram] = {}
+        self._collectors: list[Callable[[], Iterable[Family]]] = []
+
+    def counter(self, name: str, help: str, labels=()) -> Counter:
+        return self._register(Counter(f"{self.prefix}_{name}", help, labels))
+
+    def histogram(self, name: str, help: str, labels=(), **kwargs):
+        return self._register(
+            Histogram(f"{self.prefix}_{name}", help, labels, **kwargs)
+        )
+
+    def _register(self, metric):
+        return self._metrics.setdefault(metric.name, metric)
+
+    def register_collector(
+        self, collector: Callable[[], Iterable[Family]]
+    ) -> None:
+        self._collectors.append(collector)
+
+    def register_stats(
+        self,
+        subsystem: str,
+        stats: Callable[[], dict[str, float]],
+        counters: Iterable[str] = (),
+    ) -> None:
+        """
+        Export a stats() dict as one metric per key, keys listed in
+        counters become counters, the rest gauges
+        """
+        counters = set(counters)
+
+        def collect() -> Iterable[Family]:
+            for key, value in stats().items():
+                if not isinstance(value, (int, float)):
+                    continue
+                name = f"{self.prefix}_{subsystem}_{key}"
+                if key in counters:
+                    yield f"{name}_total", "counter", key, [({}, value)]
+                else:
+                    yield name, "gauge", key, [({}, value)]
+
+        self.register_collector(collect)
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            lines.extend(metric.render())
+        for collector in self._collectors:
+            for name, type, help, samples in collector():
+                lines.append(f"# HELP {name} {help}")
+                lines.append(f"# TYPE {name} {type}")
+                for labels, value in samples:
+                    lines.append(
+                        f"{name}{_labels(labels, labels.values())}"
+                        f" {_number(value)}"
+                    )
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
@@ -1,15 +1,57 @@
+import asyncio
+from typing import Any
+
+from sqlalchemy import text
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, AsyncEngine
 from sqlalchemy.orm import declarative_base, sessionmaker
 
-from src.core.config import app_settings
+from src.core.config import AppSettings, app_settings
+from src.db.metrics import InstrumentedQueuePool, db_metrics
+
+
+def engine_options(settings: AppSettings) -> dict[str, Any]:
+    options = {"echo": settings.project_db_echo, "future": True}
+    if settings.project_db.startswith("sqlite"):
+        # aiosqlite runs without a connection pool
+        return options
+    options.update(
+        poolclass=InstrumentedQueuePool,
+        pool_size=settings.project_db_pool_size,
+        max_overflow=settings.project_db_max_overflow,
+        pool_timeout=settings.project_db_pool_timeout,
+        pool_recycle=settings.project_db_pool_recycle,
+        pool_pre_ping=settings.project_db_pool_pre_ping,
+    )
+    if "asyncpg" in settings.project_db:
+        options["connect_args"] = {
+            "statement_cache_size": settings.project_db_statement_cache_size,
+        }
+    return options
+
 
 Base = declarative_base()
-engine: AsyncEngine = create_async_engine(app_settings.project_db, echo=True, future=True)
+engine: AsyncEngine = create_async_engine(
+    app_settings.project_db, **engine_options(app_settings)
+)
+db_metrics.instrument(engine)
 async_session = sessionmaker(
     engine, class_=AsyncSession, expire_on_commit=False
 )
 
 
+async def warm_up_pool(connections: int) -> None:
+    """
+    Open connections concurrently so the pool holds them before the
+    first request, anything above pool_size is closed on release
+    """
+
+    async def touch() -> None:
+        async with engine.connect() as connection:
+            await connection.execute(text("SELECT 1"))
+
+    await asyncio.gather(*(touch() for _ in range(connections)))
+
+
 async def get_session() -> AsyncSession:
     async with async_session() as session:
         yield session
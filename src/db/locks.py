@@ -0,0 +1,62 @@
+import fcntl
+import os
+import tempfile
+import zlib
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.db.db import async_session, engine
+
+
+@asynccontextmanager
+async def exclusive_session(name: str) -> AsyncIterator[AsyncSession | None]:
+    """
+    Session for one run of a job that must not overlap across workers,
+    None while another worker holds it. Postgres takes a session level
+    advisory lock on a connection of its own, kept across the commits
+    of the run; other databases flock a per-job file, which covers the
+    workers of one host.
+    """
+    if engine.dialect.name == "postgresql":
+        key = zlib.crc32(name.encode())
+        async with engine.connect() as connection:
+            acquired = await connection.scalar(
+                text("SELECT pg_try_advisory_lock(:key)"), {"key": key}
+            )
+            await connection.commit()
+            if not acquired:
+                yield None
+                return
+            try:
+                async with AsyncSession(
+                    bind=connection, expire_on_commit=False
+                ) as db:
+                    yield db
+            finally:
+                await connection.rollback()
+                await connection.execute(
+                    text("SELECT pg_advisory_unlock(:key)"), {"key": key}
+                )
+                await connection.commit()
+        return
+    directory = (
+        "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+    )
+    fd = os.open(
+        os.path.join(directory, f"urlshorter-job-{name}"),
+        os.O_RDWR | os.O_CREAT,
+        0o600,
+    )
+    try:
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            yield None
+            return
+        async with async_session() as db:
+            yield db
+    finally:
+        os.close(fd)
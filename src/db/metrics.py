@@ -0,0 +1,156 @@
+import time
+from dataclasses import dataclass
+from typing import Iterable
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+from src.core.metrics import Family, registry
+
+OTHER_STATEMENTS = "<other>"
+
+
+@dataclass
+class Timing:
+    count: int = 0
+    total: float = 0.0
+    max: float = 0.0
+
+    def observe(self, elapsed: float) -> None:
+        self.count += 1
+        self.total += elapsed
+        if elapsed > self.max:
+            self.max = elapsed
+
+
+class DBMetrics:
+    """
+    Connection pool and statement timings collected from SQLAlchemy
+    engine events. Statements are keyed by their SQL text, at most
+    max_statements distinct ones, the rest is summed up as <other>.
+    """
+
+    def __init__(self, max_statements: int = 100):
+        self.max_statements = max_statements
+        self.checkout_wait = Timing()
+        self.statements: dict[str, Timing] = {}
+        self.checkouts = 0
+        self.connects = 0
+        self._engine: AsyncEngine | None = None
+
+    def observe_statement(self, statement: str, elapsed: float) -> None:
+        timing = self.statements.get(statement)
+        if timing is None:
+            if len(self.statements) >= self.max_statements:
+                statement = OTHER_STATEMENTS
+            timing = self.statements.setdefault(statement, Timing())
+        timing.observe(elapsed)
+
+    def pool_status(self) -> dict[str, int]:
+        pool = self._engine.pool if self._engine is not None else None
+        if not isinstance(pool, QueuePool):
+            return {}
+        return {
+            "size": pool.size(),
+            "checked_in": pool.checkedin(),
+            "checked_out": pool.checkedout(),
+            "overflow": max(pool.overflow(), 0),
+        }
+
+    def instrument(self, engine: AsyncEngine) -> None:
+        self._engine = engine
+        sync_engine = engine.sync_engine
+
+        @event.listens_for(sync_engine.pool, "connect")
+        def on_connect(dbapi_connection, connection_record):
+            self.connects += 1
+
+        @event.listens_for(sync_engine.pool, "checkout")
+        def on_checkout(dbapi_connection, connection_record, proxy):
+            self.checkouts += 1
+
+        @event.listens_for(sync_engine, "before_cursor_execute")
+        def before_execute(
+            connection, cursor, statement, parameters, context, executemany
+        ):
+            connection.info.setdefault("query_started", []).append(
+                time.perf_counter()
+            )
+
+        @event.listens_for(sync_engine, "after_cursor_execute")
+        def after_execute(
+            connection, cursor, statement, parameters, context, executemany
+        ):
+            started = connection.info["query_started"].pop()
+            self.observe_statement(statement, time.perf_counter() - started)
+
+    def stats(self) -> dict:
+        statements = sorted(
+            self.statements.items(), key=lambda item: -item[1].total
+        )
+        return {
+            "pool": self.pool_status(),
+            "connects": self.connects,
+            "checkouts": self.checkouts,
+            "checkout_wait": _timing_stats(self.checkout_wait),
+            "statements": [
+                {"statement": statement, **_timing_stats(timing)}
+                for statement, timing in statements
+            ],
+        }
+
+    def collect(self) -> Iterable[Family]:
+        """Registry collector of pool gauges and statement timings"""
+        prefix = f"{registry.prefix}_db"
+        for key, value in self.pool_status().items():
+            yield f"{prefix}_pool_{key}", "gauge", key, [({}, value)]
+        yield f"{prefix}_connects_total", "counter", "connects", [
+            ({}, self.connects)
+        ]
+        yield f"{prefix}_checkouts_total", "counter", "checkouts", [
+            ({}, self.checkouts)
+        ]
+        yield f"{prefix}_checkout_wait_seconds_total", "counter", (
+            "time spent waiting for a pooled connection"
+        ), [({}, self.checkout_wait.total)]
+        statements = list(self.statements.items())
+        yield f"{prefix}_statements_total", "counter", "statements run", [
+            ({"statement": statement}, timing.count)
+            for statement, timing in statements
+        ]
+        yield f"{prefix}_statement_seconds_total", "counter", (
+            "time spent in statements"
+        ), [
+            ({"statement": statement}, timing.total)
+            for statement, timing in statements
+        ]
+
+    def reset(self) -> None:
+        self.checkout_wait = Timing()
+        self.statements.clear()
+        self.checkouts = 0
+        self.connects = 0
+
+
+def _timing_stats(timing: Timing) -> dict[str, float]:
+    return {
+        "count": timing.count,
+        "total_ms": timing.total * 1000,
+        "max_ms": timing.max * 1000,
+    }
+
+
+db_metrics = DBMetrics()
+registry.register_collector(db_metrics.collect)
+
+
+class InstrumentedQueuePool(AsyncAdaptedQueuePool):
+    """Pool that times how long callers wait for a connection"""
+
+    def connect(self):
+        started = time.perf_counter()
+        try:
+            return super().connect()
+        finally:
+            db_metrics.checkout_wait.observe(time.perf_counter() - started)
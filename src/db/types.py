@@ -0,0 +1,34 @@
+from ipaddress import ip_address
+from typing import Any
+
+from sqlalchemy import LargeBinary
+from sqlalchemy.dialects.postgresql import INET
+from sqlalchemy.engine import Dialect
+from sqlalchemy.types import TypeDecorator, TypeEngine
+
+
+class PackedIP(TypeDecorator):
+    """
+    IP address handled as text, stored as native INET on Postgres and
+    as its 4 or 16 raw bytes elsewhere
+    """
+
+    impl = LargeBinary(16)
+    cache_ok = True
+
+    def load_dialect_impl(self, dialect: Dialect) -> TypeEngine:
+        if dialect.name == "postgresql":
+            return dialect.type_descriptor(INET())
+        return dialect.type_descriptor(LargeBinary(16))
+
+    def process_bind_param(self, value: Any, dialect: Dialect) -> Any:
+        if value is None or dialect.name == "postgresql":
+            return value
+        return ip_address(value).packed
+
+    def process_result_value(self, value: Any, dialect: Dialect) -> Any:
+        if value is None:
+            return None
+        if dialect.name == "postgresql":
+            return str(value)
+        return str(ip_address(value))
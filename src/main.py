@@ -1,20 +1,70 @@
+import logging
+from contextlib import asynccontextmanager
+
 import uvicorn
 from fastapi import FastAPI
 from fastapi.responses import ORJSONResponse
-from core.config import app_settings
 
-from api.v1 import base
-from middlewares.base import middlewares
+from src.api.metrics import router as metrics_router
+from src.api.redirect import router as redirect_router
+from src.api.v1 import base
+from src.core.config import app_settings
+from src.db.db import async_session, engine, warm_up_pool
+from src.middlewares.base import middlewares
+from src.services.blacklist import blacklist_index
+from src.services.bloom import link_filter
+from src.services.clicks import click_pipeline
+from src.services.invalidation import invalidation_broker
+from src.services.partitions import click_partitions
+from src.services.rollups import click_rollup
+from src.services.services import short_url_service
+
+logger = logging.getLogger(__name__)
+
+
+async def warm_up() -> None:
+    """Pooled connections and hot links ready before the first request"""
+    if not app_settings.project_db.startswith("sqlite"):
+        await warm_up_pool(app_settings.project_db_pool_size)
+    async with async_session() as db:
+        loaded = await short_url_service.prime_cache(
+            db=db, limit=app_settings.project_warmup_links
+        )
+    logger.info("Warmed up, %s links cached", loaded)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if app_settings.project_warmup:
+        await warm_up()
+    await blacklist_index.start()
+    await invalidation_broker.start()
+    await link_filter.start()
+    click_pipeline.start()
+    click_rollup.start()
+    click_partitions.start()
+    yield
+    await click_partitions.stop()
+    await click_rollup.stop()
+    await click_pipeline.stop()
+    await link_filter.stop()
+    await invalidation_broker.stop()
+    await blacklist_index.stop()
+    await engine.dispose()
 
 
 app = FastAPI(
     title=app_settings.project_name,
+    lifespan=lifespan,
     docs_url="/api/openapi",
     openapi_url="/api/openapi.json",
     default_response_class=ORJSONResponse,
 )
 #
 app.include_router(base.api_router, prefix="/api/v1")
+app.include_router(metrics_router)
+# catch-all /{code}, has to stay the last one
+app.include_router(redirect_router)
 for middleware in middlewares:
     app.add_middleware(middleware)
 
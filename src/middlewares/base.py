@@ -1,3 +1,6 @@
 from .blacklist_middleware import BlacklistMiddleware
+from .metrics_middleware import MetricsMiddleware
+from .ratelimit_middleware import RateLimitMiddleware
 
-middlewares = [BlacklistMiddleware]
\ No newline at end of file
+# added in order, the last one ends up outermost
+middlewares = [RateLimitMiddleware, BlacklistMiddleware, MetricsMiddleware]
\ No newline at end of file
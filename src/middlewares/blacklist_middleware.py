@@ -1,27 +1,32 @@
 import logging
 
-from fastapi import Request, status
+from fastapi import status
 from fastapi.responses import JSONResponse
-from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.types import ASGIApp, Receive, Scope, Send
 
-from src.db.db import get_session
-from src.services.services import blacklist_service
+from src.services.blacklist import blacklist_index
 
 logger = logging.getLogger(__name__)
 
 
-class BlacklistMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request: Request, call_next):
-        async for db in get_session():
-            blacklisted_times = await blacklist_service.count(
-                db=db, filter=dict(host=request.client.host)
-            )
-        if blacklisted_times > 0:
-            logger.info(
-                "Blacklisted client %s connection attempt", request.client.host
-            )
-            return JSONResponse(
+class BlacklistMiddleware:
+    """Pure ASGI middleware, rejects blacklisted clients before the app"""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] not in ("http", "websocket"):
+            return await self.app(scope, receive, send)
+        client = scope.get("client")
+        host = client[0] if client else None
+        if blacklist_index.contains(host):
+            logger.info("Blacklisted client %s connection attempt", host)
+            if scope["type"] == "websocket":
+                return await send({"type": "websocket.close", "code": 1008})
+            response = JSONResponse(
                 status_code=status.HTTP_403_FORBIDDEN,
                 content={"detail": "You`ve been temporary blacklisted"},
             )
-        return await call_next(request)
\ No newline at end of file
+            return await response(scope, receive, send)
+        return await self.app(scope, receive, send)
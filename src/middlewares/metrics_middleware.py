@@ -0,0 +1,52 @@
+import time
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from src.core.metrics import registry
+
+UNMATCHED_ROUTE = "<unmatched>"
+
+requests_total = registry.counter(
+    "http_requests_total",
+    "HTTP requests by route template and status",
+    labels=("method", "route", "status"),
+)
+request_duration = registry.histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency by route template and status",
+    labels=("method", "route", "status"),
+)
+
+
+class MetricsMiddleware:
+    """
+    Pure ASGI middleware counting requests and their latency per route
+    template (/api/v1/{id}, not the raw path) and status code
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        started = time.perf_counter()
+        status_code = 500
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            labels = (
+                scope["method"],
+                route.path if route is not None else UNMATCHED_ROUTE,
+                str(status_code),
+            )
+            requests_total.inc(*labels)
+            request_duration.observe(time.perf_counter() - started, *labels)
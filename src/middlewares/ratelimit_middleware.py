@@ -0,0 +1,38 @@
+import logging
+import math
+
+from fastapi import status
+from fastapi.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from src.services.ratelimit import rate_limiter, route_rule
+
+logger = logging.getLogger(__name__)
+
+
+class RateLimitMiddleware:
+    """
+    Pure ASGI middleware, answers 429 to clients out of tokens before
+    routing, so floods never reach handlers or the database
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        rule = route_rule(scope["method"], scope["path"])
+        client = scope.get("client")
+        if rule is None or not client:
+            return await self.app(scope, receive, send)
+        retry_after = rate_limiter.hit(client[0], rule)
+        if retry_after:
+            logger.debug("Client %s rate limited on %s", client[0], rule)
+            response = JSONResponse(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                content={"detail": "Too many requests"},
+                headers={"Retry-After": str(math.ceil(retry_after))},
+            )
+            return await response(scope, receive, send)
+        return await self.app(scope, receive, send)
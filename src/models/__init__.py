@@ -2,10 +2,18 @@ __all__ = [
     "User",
     "ShortedURL",
     "ShortedURLInfo",
+    "UserAgent",
     "BlacklistedClient",
+    "ClickRollup",
+    "ClickTop",
+    "RollupWatermark",
 ]
 
 from .models import User
 from .models import ShortedURL
 from .models import ShortedURLInfo
+from .models import UserAgent
 from .models import BlacklistedClient
+from .models import ClickRollup
+from .models import ClickTop
+from .models import RollupWatermark
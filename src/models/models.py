@@ -1,9 +1,18 @@
-from sqlalchemy import Boolean, Column, DateTime, ForeignKey, Integer, String
+from sqlalchemy import (
+    BigInteger,
+    Boolean,
+    Column,
+    DateTime,
+    ForeignKey,
+    Index,
+    Integer,
+    String,
+)
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql.expression import func
-from sqlalchemy_utils import IPAddressType
 
 from src.db.db import Base
+from src.db.types import PackedIP
 
 
 class User(Base):
@@ -25,13 +34,21 @@ class User(Base):
 
 class ShortedURL(Base):
     __tablename__ = "shorted_url"
-    id = Column(Integer, primary_key=True)
+    # 64 bit so sequence short codes can be decoded straight into the id,
+    # SQLite only autoincrements INTEGER primary keys
+    id = Column(
+        BigInteger().with_variant(Integer, "sqlite"), primary_key=True
+    )
     value = Column(String(1000), unique=True, nullable=False)
+    # path of value under PROJECT_SHORT_URL_BASE, none for external ones
+    code = Column(String(32), unique=True, nullable=True)
     original = Column(String(1000), unique=True, nullable=False)
     created_at = Column(
         DateTime, index=True, default=func.now(), nullable=False
     )
     deleted = Column(Boolean, default=False)
+    # maintained by the click pipeline, see services.clicks
+    clicks = Column(Integer, default=0, server_default="0", nullable=False)
 
     uses = relationship(
         "ShortedURLInfo", back_populates="url", cascade="all, delete"
@@ -43,19 +60,27 @@ class ShortedURL(Base):
 
 class ShortedURLInfo(Base):
     __tablename__ = "shorted_url_info"
+    __table_args__ = (
+        Index(
+            "ix_shorted_url_info_url_id_created_at", "url_id", "created_at"
+        ),
+    )
     id = Column(Integer, primary_key=True)
     created_at = Column(
         DateTime, index=True, default=func.now(), nullable=False
     )
-    host = Column(String(100), nullable=False)
+    host = Column(PackedIP, nullable=False)
     port = Column(Integer, nullable=False)
-    user_agent = Column(String(1000), nullable=False)
+    user_agent_id = Column(ForeignKey("user_agent.id"), nullable=False)
     url_id = Column(ForeignKey("shorted_url.id"), nullable=False)
     user_id = Column(ForeignKey("user.id"), nullable=True)
 
     url = relationship("ShortedURL", back_populates="uses")
     user = relationship("User", back_populates="short_url_info")
 
+    # string behind user_agent_id, filled in by url_info_service on read
+    user_agent = None
+
     def __repr__(self):
         return (
             f"ShortedURLInfo(peer={self.host}:{self.port},"
@@ -63,11 +88,63 @@ class ShortedURLInfo(Base):
         )
 
 
+class UserAgent(Base):
+    """Distinct user agent strings, clicks refer to them by id"""
+
+    __tablename__ = "user_agent"
+    id = Column(Integer, primary_key=True)
+    value = Column(String(1000), unique=True, nullable=False)
+
+    def __repr__(self):
+        return f"UserAgent({self.id}={self.value})"
+
+
 class BlacklistedClient(Base):
     __tablename__ = "blacklisted_client"
     id = Column(Integer, primary_key=True)
-    host = Column(IPAddressType)
+    # single address or CIDR network, same VARCHAR(50) as IPAddressType
+    host = Column(String(50))
     until = Column(DateTime, index=True, default=None, nullable=True)
 
     def __repr__(self):
-        return f"BlacklistedClient({self.host})"
\ No newline at end of file
+        return f"BlacklistedClient({self.host})"
+
+
+class ClickRollup(Base):
+    """Clicks of a short URL per minute/hour/day bucket"""
+
+    __tablename__ = "click_rollup"
+    url_id = Column(ForeignKey("shorted_url.id"), primary_key=True)
+    granularity = Column(String(10), primary_key=True)
+    bucket = Column(DateTime, primary_key=True)
+    clicks = Column(Integer, default=0, nullable=False)
+
+    def __repr__(self):
+        return (
+            f"ClickRollup(url={self.url_id}, {self.granularity}"
+            f" {self.bucket}: {self.clicks})"
+        )
+
+
+class ClickTop(Base):
+    """Clicks of a short URL per user agent or client host"""
+
+    __tablename__ = "click_top"
+    url_id = Column(ForeignKey("shorted_url.id"), primary_key=True)
+    kind = Column(String(20), primary_key=True)
+    value = Column(String(1000), primary_key=True)
+    clicks = Column(Integer, default=0, nullable=False)
+
+    def __repr__(self):
+        return f"ClickTop(url={self.url_id}, {self.kind}={self.value})"
+
+
+class RollupWatermark(Base):
+    """Last shorted_url_info.id already folded into the rollups"""
+
+    __tablename__ = "rollup_watermark"
+    name = Column(String(50), primary_key=True)
+    last_id = Column(Integer, default=0, nullable=False)
+
+    def __repr__(self):
+        return f"RollupWatermark({self.name}={self.last_id})"
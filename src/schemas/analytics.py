@@ -0,0 +1,21 @@
+from datetime import datetime
+from typing import Literal
+
+from pydantic import BaseModel, conint
+
+
+class ClickBucket(BaseModel):
+    bucket: datetime
+    count: conint(ge=0)
+
+
+class ClickTopEntry(BaseModel):
+    value: str
+    count: conint(ge=0)
+
+
+class ShortURLAnalytics(BaseModel):
+    granularity: Literal["minute", "hour", "day"]
+    buckets: list[ClickBucket]
+    top_user_agents: list[ClickTopEntry]
+    top_hosts: list[ClickTopEntry]
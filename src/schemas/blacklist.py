@@ -1,17 +1,26 @@
 from datetime import datetime
+from ipaddress import ip_network
 
-from pydantic import BaseModel, conint
-from pydantic.networks import IPv4Address
+from pydantic import BaseModel, conint, field_validator
 
 
 class BlacklistedClientCreate(BaseModel):
-    host: IPv4Address
+    host: str
     until: datetime | None
 
+    @field_validator("host")
+    @classmethod
+    def normalize_host(cls, value: str) -> str:
+        """Accepts an IPv4/IPv6 address or CIDR network"""
+        network = ip_network(value.strip(), strict=False)
+        if network.prefixlen == network.max_prefixlen:
+            return str(network.network_address)
+        return str(network)
+
 
 class BlacklistedClient(BaseModel):
     id: conint(ge=0)
-    host: IPv4Address
+    host: str
     until: datetime | None
 
     class Config:
@@ -6,6 +6,7 @@ from src.schemas.base import BaseSchema
 class ShortedURL(BaseSchema):
     model_config = ConfigDict(from_attributes=True)
     value: HttpUrl
+    code: str | None = None
     original: HttpUrl
     deleted: bool
 
@@ -0,0 +1,38 @@
+from pydantic import BaseModel, conint
+
+
+class CacheStats(BaseModel):
+    size: conint(ge=0)
+    maxsize: int
+    hits: conint(ge=0)
+    misses: conint(ge=0)
+    evictions: conint(ge=0)
+    expirations: conint(ge=0)
+
+
+class ClickPipelineStats(BaseModel):
+    pending: conint(ge=0)
+    max_size: int
+    enqueued: conint(ge=0)
+    dropped: conint(ge=0)
+    written: conint(ge=0)
+    failed: conint(ge=0)
+    batches: conint(ge=0)
+
+
+class TimingStats(BaseModel):
+    count: conint(ge=0)
+    total_ms: float
+    max_ms: float
+
+
+class StatementStats(TimingStats):
+    statement: str
+
+
+class DBStats(BaseModel):
+    pool: dict[str, int]
+    connects: conint(ge=0)
+    checkouts: conint(ge=0)
+    checkout_wait: TimingStats
+    statements: list[StatementStats]
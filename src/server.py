@@ -0,0 +1,46 @@
+"""
+Production entry point: N workers on uvloop and httptools, no reloader.
+
+    python server.py
+"""
+import logging
+import os
+from importlib.util import find_spec
+
+import uvicorn
+
+from src.core.config import app_settings
+
+logger = logging.getLogger(__name__)
+
+
+def pick(preferred: str) -> str:
+    """Preferred uvicorn implementation if installed, its default if not"""
+    if find_spec(preferred) is not None:
+        return preferred
+    logger.warning("%s is not installed, using the default", preferred)
+    return "auto"
+
+
+def main() -> None:
+    workers = app_settings.project_workers or os.cpu_count() or 1
+    uvicorn.run(
+        "main:app",
+        host=app_settings.project_host,
+        port=app_settings.project_port,
+        workers=workers,
+        loop=pick("uvloop"),
+        http=pick("httptools"),
+        reload=False,
+        # src.core.config has set up logging already
+        log_config=None,
+        lifespan="on",
+        access_log=app_settings.project_access_log,
+        backlog=app_settings.project_backlog,
+        timeout_keep_alive=app_settings.project_keep_alive,
+        timeout_graceful_shutdown=app_settings.project_graceful_timeout,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,12 @@
+import base64
+import binascii
 import logging
-from typing import Any, Generic, Type, TypeVar
+from datetime import datetime
+from typing import Any, AsyncIterator, Generic, Sequence, Type, TypeVar
 
 from pydantic import BaseModel
-from sqlalchemy import delete, insert, select, update
+from sqlalchemy import Row, Table, delete, insert, select, tuple_, update
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.sql import functions
 
@@ -28,6 +32,49 @@ class Repository:
         raise NotImplementedError
 
 
+def encode_cursor(created_at: datetime, id: int) -> str:
+    raw = f"{created_at.isoformat()}|{id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, id = raw.decode().split("|")
+        return datetime.fromisoformat(created_at), int(id)
+    except (binascii.Error, UnicodeDecodeError, ValueError) as error:
+        raise ValueError("Malformed cursor") from error
+
+
+def dialect_insert(db: AsyncSession, table: Table):
+    """INSERT supporting ON CONFLICT clauses of the session's dialect"""
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        return postgresql.insert(table)
+    if dialect == "sqlite":
+        return sqlite.insert(table)
+    raise NotImplementedError(f"ON CONFLICT is not supported for {dialect}")
+
+
+async def upsert_increment(
+    db: AsyncSession,
+    table: Table,
+    rows: list[dict[str, Any]],
+    *,
+    keys: Sequence[str],
+    counter: str,
+) -> None:
+    """Insert rows or add their counter to the already stored ones"""
+    if not rows:
+        return
+    statement = dialect_insert(db, table)
+    statement = statement.on_conflict_do_update(
+        index_elements=[table.c[key] for key in keys],
+        set_={counter: table.c[counter] + statement.excluded[counter]},
+    )
+    await db.execute(statement, rows)
+
+
 ModelType = TypeVar("ModelType", bound=Base)
 CreateSchemaType = TypeVar("CreateSchemaType", bound=BaseModel)
 UpdateSchemaType = TypeVar("UpdateSchemaType", bound=BaseModel)
@@ -49,16 +96,81 @@ class RepositoryDB(
         db: AsyncSession,
         *,
         filter: dict[str, Any] = None,
+        since: datetime | None = None,
+        until: datetime | None = None,
         skip: int = 0,
         limit: int = 100,
     ) -> list[ModelType]:
         filter = filter or {}
+        statement = select(self._model).filter_by(**filter)
+        if since is not None:
+            statement = statement.where(self._model.created_at >= since)
+        if until is not None:
+            statement = statement.where(self._model.created_at < until)
         statement = (
-            select(self._model).filter_by(**filter).offset(skip).limit(limit)
+            statement.order_by(self._model.id).offset(skip).limit(limit)
         )
         results = await db.execute(statement=statement)
         return results.scalars().all()
 
+    async def get_page(
+        self,
+        db: AsyncSession,
+        *,
+        filter: dict[str, Any] = None,
+        after: tuple[datetime, int] | None = None,
+        since: datetime | None = None,
+        until: datetime | None = None,
+        limit: int = 100,
+    ) -> list[ModelType]:
+        """
+        Keyset pagination over (created_at, id): every page is an index
+        range scan starting right after the last row of the previous one
+        """
+        filter = filter or {}
+        key = tuple_(self._model.created_at, self._model.id)
+        statement = select(self._model).filter_by(**filter)
+        if after is not None:
+            statement = statement.where(key > tuple_(*after))
+        if since is not None:
+            statement = statement.where(self._model.created_at >= since)
+        if until is not None:
+            statement = statement.where(self._model.created_at < until)
+        statement = statement.order_by(
+            self._model.created_at, self._model.id
+        ).limit(limit)
+        results = await db.execute(statement=statement)
+        return results.scalars().all()
+
+    async def stream(
+        self,
+        db: AsyncSession,
+        *,
+        columns: Sequence[str],
+        filter: dict[str, Any] = None,
+        since: datetime | None = None,
+        until: datetime | None = None,
+        chunk_size: int = 1000,
+    ) -> AsyncIterator[Sequence[Row]]:
+        """
+        Plain column rows in (created_at, id) order read through
+        a server-side cursor, chunk_size rows at a time
+        """
+        filter = filter or {}
+        statement = (
+            select(*[getattr(self._model, column) for column in columns])
+            .filter_by(**filter)
+            .order_by(self._model.created_at, self._model.id)
+            .execution_options(yield_per=chunk_size)
+        )
+        if since is not None:
+            statement = statement.where(self._model.created_at >= since)
+        if until is not None:
+            statement = statement.where(self._model.created_at < until)
+        result = await db.stream(statement)
+        async for rows in result.partitions(chunk_size):
+            yield rows
+
     async def create(
         self, db: AsyncSession, *, object_in: CreateSchemaType | dict[str, Any]
     ) -> ModelType:
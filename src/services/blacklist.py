@@ -0,0 +1,215 @@
+import asyncio
+import heapq
+import logging
+import time
+from datetime import datetime
+from ipaddress import ip_address, ip_network
+
+from sqlalchemy import or_, select
+
+from src.core.config import app_settings
+from src.core.metrics import registry
+from src.db.db import async_session
+from src.db.locks import exclusive_session
+from src.models.models import BlacklistedClient
+from src.services.invalidation import invalidation_broker
+from src.services.services import blacklist_service
+
+logger = logging.getLogger(__name__)
+
+# (ip version, prefix length, network address as int)
+NetworkKey = tuple[int, int, int]
+
+
+def _network_key(host: str) -> NetworkKey:
+    network = ip_network(host, strict=False)
+    return (
+        network.version,
+        network.prefixlen,
+        int(network.network_address),
+    )
+
+
+class BlacklistIndex:
+    """
+    In-memory matcher of blacklisted hosts and networks.
+    Networks are kept in a hash table per prefix length, so a lookup
+    masks the address once for every prefix length in use (at most 33
+    for IPv4 and 129 for IPv6) and never touches the database.
+    Temporary bans sit in a min-heap by expiry and leave the index
+    as soon as a lookup sees them expired.
+    """
+
+    def __init__(
+        self, refresh_interval: float = 30, purge_interval: float = 300
+    ):
+        self.refresh_interval = refresh_interval
+        self.purge_interval = purge_interval
+        self._entries: dict[int, NetworkKey] = {}
+        # entry id -> expiry timestamp, heap of (expiry, id) may hold
+        # stale pairs that are skipped when popped
+        self._until: dict[int, float] = {}
+        self._expiry: list[tuple[float, int]] = []
+        # version -> prefix length -> network -> blacklist entry ids
+        self._tables: dict[int, dict[int, dict[int, set[int]]]] = {
+            4: {},
+            6: {},
+        }
+        self._prefixes: dict[int, list[int]] = {4: [], 6: []}
+        self._tasks: list[asyncio.Task] = []
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def add(self, id: int, host: str, until: datetime | None = None) -> None:
+        try:
+            key = _network_key(host)
+        except ValueError:
+            logger.warning("Skipping malformed blacklist host %s", host)
+            return
+        self.remove(id)
+        if until is not None:
+            expires_at = until.timestamp()
+            if expires_at <= time.time():
+                return
+            self._until[id] = expires_at
+            heapq.heappush(self._expiry, (expires_at, id))
+        version, prefixlen, network = key
+        table = self._tables[version].setdefault(prefixlen, {})
+        table.setdefault(network, set()).add(id)
+        self._entries[id] = key
+        self._update_prefixes(version)
+
+    def remove(self, id: int) -> None:
+        key = self._entries.pop(id, None)
+        if key is None:
+            return
+        self._until.pop(id, None)
+        version, prefixlen, network = key
+        table = self._tables[version][prefixlen]
+        ids = table[network]
+        ids.discard(id)
+        if not ids:
+            del table[network]
+        if not table:
+            del self._tables[version][prefixlen]
+            self._update_prefixes(version)
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._until.clear()
+        self._expiry.clear()
+        for version in self._tables:
+            self._tables[version].clear()
+            self._prefixes[version] = []
+
+    def _update_prefixes(self, version: int) -> None:
+        self._prefixes[version] = sorted(self._tables[version])
+
+    def expire(self, now: float | None = None) -> int:
+        """Drop entries whose ban is over, returns how many were dropped"""
+        now = time.time() if now is None else now
+        expired = 0
+        while self._expiry and self._expiry[0][0] <= now:
+            expires_at, id = heapq.heappop(self._expiry)
+            if self._until.get(id) == expires_at:
+                self.remove(id)
+                expired += 1
+        return expired
+
+    def contains(self, host: str | None) -> bool:
+        if self._expiry and self._expiry[0][0] <= time.time():
+            self.expire()
+        if not self._entries or not host:
+            return False
+        try:
+            address = ip_address(host)
+        except ValueError:
+            return False
+        bits = address.max_prefixlen
+        value = int(address)
+        tables = self._tables[address.version]
+        for prefixlen in self._prefixes[address.version]:
+            network = value >> (bits - prefixlen) << (bits - prefixlen)
+            if network in tables[prefixlen]:
+                return True
+        return False
+
+    async def reload(self) -> None:
+        statement = select(
+            BlacklistedClient.id,
+            BlacklistedClient.host,
+            BlacklistedClient.until,
+        ).where(
+            or_(
+                BlacklistedClient.until.is_(None),
+                BlacklistedClient.until > datetime.now(),
+            )
+        )
+        async with async_session() as db:
+            rows = (await db.execute(statement)).all()
+        self.clear()
+        for id, host, until in rows:
+            self.add(id, host, until)
+        logger.debug("Blacklist index reloaded, %s entries", len(self))
+
+    async def purge(self) -> int:
+        async with exclusive_session("blacklist_purge") as db:
+            if db is None:
+                return 0
+            purged = await blacklist_service.purge_expired(
+                db=db, now=datetime.now()
+            )
+        if purged:
+            logger.info("Purged %s expired blacklist entries", purged)
+        return purged
+
+    async def run(self) -> None:
+        while True:
+            await asyncio.sleep(self.refresh_interval)
+            try:
+                await self.reload()
+            except Exception:
+                logger.exception("Blacklist index refresh failed")
+
+    async def run_purge(self) -> None:
+        while True:
+            await asyncio.sleep(self.purge_interval)
+            try:
+                await self.purge()
+            except Exception:
+                logger.exception("Blacklist purge failed")
+
+    async def start(self) -> None:
+        """Load the index, then keep refreshing and purging it"""
+        await self.reload()
+        if self._tasks:
+            return
+        if self.refresh_interval > 0:
+            self._tasks.append(asyncio.create_task(self.run()))
+        if self.purge_interval > 0:
+            self._tasks.append(asyncio.create_task(self.run_purge()))
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._tasks = []
+
+
+blacklist_index = BlacklistIndex(
+    refresh_interval=app_settings.project_blacklist_refresh_interval,
+    purge_interval=app_settings.project_blacklist_purge_interval,
+)
+registry.register_stats(
+    "blacklist", lambda: {"entries": len(blacklist_index)}
+)
+# changes made by other workers, the table is small enough to reload
+invalidation_broker.subscribe(
+    "blacklist",
+    lambda ids: blacklist_index.reload(),
+    reset=blacklist_index.reload,
+)
@@ -0,0 +1,195 @@
+import asyncio
+import hashlib
+import logging
+import math
+from typing import Hashable
+
+from sqlalchemy import func, select
+
+from src.core.config import app_settings
+from src.core.metrics import registry
+from src.db.db import async_session
+from src.models.models import ShortedURL
+
+from .cache import LRUCache
+from .shorter import MAX_ID
+
+logger = logging.getLogger(__name__)
+
+
+class BloomFilter:
+    """
+    Fixed size set of integers with no false negatives and about
+    error_rate false positives once capacity items are in
+    """
+
+    def __init__(self, capacity: int, error_rate: float = 0.01):
+        capacity = max(capacity, 1)
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.size = max(
+            8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2)
+        )
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self._bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, key: int) -> list[int]:
+        # double hashing, k positions out of one 128 bit digest
+        digest = hashlib.blake2b(
+            key.to_bytes(8, "little", signed=True), digest_size=16
+        ).digest()
+        first = int.from_bytes(digest[:8], "little")
+        second = int.from_bytes(digest[8:], "little") | 1
+        return [(first + i * second) % self.size for i in range(self.hashes)]
+
+    def add(self, key: int) -> None:
+        for position in self._positions(key):
+            self._bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, key: int) -> bool:
+        return all(
+            self._bits[position >> 3] & (1 << (position & 7))
+            for position in self._positions(key)
+        )
+
+
+class LinkFilter:
+    """
+    Tells apart short URLs that certainly do not exist without asking
+    the database. A Bloom filter of every stored id is rebuilt on start
+    and every refresh_interval seconds and extended with ids created by
+    this process. Other workers insert too, so the filter only vouches
+    for ids up to the highest one seen a reload earlier: rows below it
+    had a whole interval to commit. Misses above that watermark, and
+    misses of codes, are remembered for miss_ttl seconds.
+    """
+
+    def __init__(
+        self,
+        capacity: int = 1_000_000,
+        error_rate: float = 0.01,
+        refresh_interval: float = 60,
+        miss_cache_size: int = 10000,
+        miss_ttl: float = 5,
+    ):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.refresh_interval = refresh_interval
+        self._filter = BloomFilter(capacity, error_rate)
+        self._misses: LRUCache[Hashable, bool] = LRUCache(
+            maxsize=miss_cache_size, ttl=miss_ttl
+        )
+        self.watermark = 0
+        self._last_max_id = 0
+        # ids created while a reload is reading the table
+        self._pending: list[int] | None = None
+        self._task: asyncio.Task | None = None
+        self.rejected = 0
+        self.reloads = 0
+
+    def add(self, id: int, code: str | None = None) -> None:
+        self._filter.add(id)
+        if self._pending is not None:
+            self._pending.append(id)
+        self._misses.invalidate(id)
+        if code is not None:
+            self._misses.invalidate(code)
+
+    def miss(self, key: int | str) -> None:
+        """Remember a lookup that found nothing, key is an id or a code"""
+        self._misses.set(key, True)
+
+    def known_missing(self, key: int | str) -> bool:
+        if isinstance(key, int) and not 0 < key <= MAX_ID:
+            # no row can have it, and it would not fit the hash input
+            self.rejected += 1
+            return True
+        if key in self._misses or (
+            isinstance(key, int)
+            and key <= self.watermark
+            and key not in self._filter
+        ):
+            self.rejected += 1
+            return True
+        return False
+
+    def clear(self) -> None:
+        self._filter = BloomFilter(self.capacity, self.error_rate)
+        self._misses.clear()
+        self.watermark = 0
+        self._last_max_id = 0
+
+    async def reload(self) -> None:
+        self._pending = []
+        try:
+            async with async_session() as db:
+                count = await db.scalar(select(func.count(ShortedURL.id)))
+                bloom = BloomFilter(
+                    max(self.capacity, 2 * (count or 0)), self.error_rate
+                )
+                max_id = 0
+                result = await db.stream_scalars(
+                    select(ShortedURL.id).execution_options(yield_per=10000)
+                )
+                async for id in result:
+                    bloom.add(id)
+                    max_id = max(max_id, id)
+            for id in self._pending:
+                bloom.add(id)
+        finally:
+            self._pending = None
+        self._filter = bloom
+        self.watermark = self._last_max_id
+        self._last_max_id = max_id
+        self.reloads += 1
+        logger.debug(
+            "Link filter reloaded, %s ids, trusted up to %s",
+            bloom.count,
+            self.watermark,
+        )
+
+    async def run(self) -> None:
+        while True:
+            await asyncio.sleep(self.refresh_interval)
+            try:
+                await self.reload()
+            except Exception:
+                logger.exception("Link filter reload failed")
+
+    async def start(self) -> None:
+        await self.reload()
+        if self._task is None and self.refresh_interval > 0:
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "ids": self._filter.count,
+            "bits": self._filter.size,
+            "watermark": self.watermark,
+            "misses": len(self._misses),
+            "rejected": self.rejected,
+            "reloads": self.reloads,
+        }
+
+
+link_filter = LinkFilter(
+    capacity=app_settings.project_link_filter_capacity,
+    error_rate=app_settings.project_link_filter_error_rate,
+    refresh_interval=app_settings.project_link_filter_refresh_interval,
+    miss_cache_size=app_settings.project_link_miss_cache_size,
+    miss_ttl=app_settings.project_link_miss_ttl,
+)
+registry.register_stats(
+    "link_filter", link_filter.stats, counters=("rejected", "reloads")
+)
@@ -0,0 +1,95 @@
+import time
+from collections import OrderedDict
+from typing import Any, Generic, Hashable, NamedTuple, TypeVar
+
+from src.core.config import app_settings
+from src.core.metrics import registry
+
+KeyType = TypeVar("KeyType", bound=Hashable)
+ValueType = TypeVar("ValueType")
+
+
+class Link(NamedTuple):
+    id: int
+    original: str
+    deleted: bool
+    code: str | None = None
+
+
+class LRUCache(Generic[KeyType, ValueType]):
+    """
+    Bounded in-process cache with LRU eviction and per-entry TTL.
+    Not thread safe, meant to be used from the event loop only.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float | None = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: OrderedDict[KeyType, tuple[float, ValueType]] = (
+            OrderedDict()
+        )
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key: KeyType) -> bool:
+        entry = self._data.get(key)
+        return entry is not None and entry[0] > time.monotonic()
+
+    def get(self, key: KeyType, default: Any = None) -> ValueType | Any:
+        entry = self._data.get(key)
+        if entry is None:
+            self.misses += 1
+            return default
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._data[key]
+            self.expirations += 1
+            self.misses += 1
+            return default
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: KeyType, value: ValueType) -> None:
+        if self.maxsize <= 0:
+            return
+        expires_at = (
+            time.monotonic() + self.ttl if self.ttl else float("inf")
+        )
+        self._data[key] = (expires_at, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, key: KeyType) -> None:
+        self._data.pop(key, None)
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+
+url_cache: LRUCache[int, Link] = LRUCache(
+    maxsize=app_settings.project_url_cache_size,
+    ttl=app_settings.project_url_cache_ttl,
+)
+registry.register_stats(
+    "url_cache",
+    url_cache.stats,
+    counters=("hits", "misses", "evictions", "expirations"),
+)
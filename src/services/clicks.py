@@ -0,0 +1,178 @@
+import asyncio
+import logging
+from collections import Counter
+from datetime import datetime
+from ipaddress import ip_address
+from typing import NamedTuple
+
+from sqlalchemy import bindparam, insert, update
+
+from src.core.config import app_settings
+from src.core.metrics import registry
+from src.db.db import async_session
+from src.models.models import ShortedURL, ShortedURLInfo
+from src.services.user_agents import user_agents
+
+logger = logging.getLogger(__name__)
+
+# recorded for peers without an IP address (unix sockets, test clients)
+UNKNOWN_HOST = "0.0.0.0"
+
+
+class ClickEvent(NamedTuple):
+    url_id: int
+    host: str
+    port: int
+    user_agent: str
+    created_at: datetime
+
+
+class ClickPipeline:
+    """
+    Bounded buffer of redirect events drained by a background worker
+    into shorted_url_info with multi-row INSERTs. Flushes when a batch
+    is full or every flush_interval seconds, events over max_size are
+    dropped instead of slowing the redirect down.
+    Each batch also bumps shorted_url.clicks once per distinct URL
+    in the same transaction. User agents are interned first, rows only
+    carry their ids.
+    """
+
+    _table = ShortedURL.__table__
+    _bump_clicks = (
+        update(_table)
+        .where(_table.c.id == bindparam("url_id_"))
+        .values(clicks=_table.c.clicks + bindparam("clicks_"))
+    )
+
+    def __init__(
+        self,
+        max_size: int = 100000,
+        batch_size: int = 500,
+        flush_interval: float = 1.0,
+    ):
+        self.max_size = max_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._buffer: list[ClickEvent] = []
+        self._wakeup = asyncio.Event()
+        self._task: asyncio.Task | None = None
+        self._stopping = False
+        self.enqueued = 0
+        self.dropped = 0
+        self.written = 0
+        self.failed = 0
+        self.batches = 0
+
+    def __len__(self) -> int:
+        return len(self._buffer)
+
+    def enqueue(
+        self, url_id: int, host: str, port: int, user_agent: str
+    ) -> bool:
+        if len(self._buffer) >= self.max_size:
+            self.dropped += 1
+            return False
+        try:
+            ip_address(host)
+        except ValueError:
+            host = UNKNOWN_HOST
+        self._buffer.append(
+            ClickEvent(url_id, host, port, user_agent, datetime.utcnow())
+        )
+        self.enqueued += 1
+        if len(self._buffer) >= self.batch_size:
+            self._wakeup.set()
+        return True
+
+    async def flush(self) -> int:
+        """Write out everything buffered so far, returns rows written"""
+        written = 0
+        while self._buffer:
+            batch = self._buffer[: self.batch_size]
+            del self._buffer[: self.batch_size]
+            written += await self._write(batch)
+        return written
+
+    async def _write(self, batch: list[ClickEvent]) -> int:
+        clicks = [
+            {"url_id_": url_id, "clicks_": count}
+            for url_id, count in Counter(e.url_id for e in batch).items()
+        ]
+        try:
+            ids = await user_agents.intern(
+                event.user_agent for event in batch
+            )
+            async with async_session() as db:
+                rows = [
+                    {
+                        "url_id": event.url_id,
+                        "host": event.host,
+                        "port": event.port,
+                        "user_agent_id": ids[event.user_agent],
+                        "created_at": event.created_at,
+                    }
+                    for event in batch
+                ]
+                await db.execute(insert(ShortedURLInfo), rows)
+                await db.execute(self._bump_clicks, clicks)
+                await db.commit()
+        except Exception:
+            self.failed += len(batch)
+            logger.exception("Failed to write %s click events", len(batch))
+            return 0
+        self.written += len(batch)
+        self.batches += 1
+        return len(batch)
+
+    async def run(self) -> None:
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(
+                    self._wakeup.wait(), timeout=self.flush_interval
+                )
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+    def start(self) -> None:
+        if self._task is not None:
+            return
+        self._stopping = False
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self.run())
+        logger.info("Click pipeline started")
+
+    async def stop(self) -> None:
+        """Stop the worker and flush whatever is still buffered"""
+        if self._task is not None:
+            self._stopping = True
+            self._wakeup.set()
+            await self._task
+            self._task = None
+        written = await self.flush()
+        logger.info("Click pipeline stopped, %s events flushed", written)
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "pending": len(self._buffer),
+            "max_size": self.max_size,
+            "enqueued": self.enqueued,
+            "dropped": self.dropped,
+            "written": self.written,
+            "failed": self.failed,
+            "batches": self.batches,
+        }
+
+
+click_pipeline = ClickPipeline(
+    max_size=app_settings.project_click_queue_size,
+    batch_size=app_settings.project_click_batch_size,
+    flush_interval=app_settings.project_click_flush_interval,
+)
+registry.register_stats(
+    "click_pipeline",
+    click_pipeline.stats,
+    counters=("enqueued", "dropped", "written", "failed", "batches"),
+)
@@ -0,0 +1,62 @@
+import csv
+import io
+from datetime import datetime
+from typing import AsyncIterator
+
+import orjson
+
+from src.db.db import async_session
+from src.services.services import url_info_service
+
+CLICK_COLUMNS = (
+    "id",
+    "created_at",
+    "host",
+    "port",
+    "user_agent",
+    "url_id",
+    "user_id",
+)
+MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+
+async def export_clicks(
+    url_id: int,
+    format: str = "ndjson",
+    since: datetime | None = None,
+    until: datetime | None = None,
+    chunk_size: int = 1000,
+) -> AsyncIterator[bytes]:
+    """
+    Click history of a short URL encoded chunk by chunk, so memory use
+    does not depend on the history size. Opens its own session as it
+    outlives the request handler.
+    """
+    if format == "csv":
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(CLICK_COLUMNS)
+        yield buffer.getvalue().encode()
+    async with async_session() as db:
+        chunks = url_info_service.stream(
+            db=db,
+            columns=CLICK_COLUMNS,
+            filter=dict(url_id=url_id),
+            since=since,
+            until=until,
+            chunk_size=chunk_size,
+        )
+        async for rows in chunks:
+            if format == "csv":
+                buffer.seek(0)
+                buffer.truncate()
+                writer.writerows(rows)
+                yield buffer.getvalue().encode()
+            else:
+                yield b"".join(
+                    orjson.dumps(dict(zip(CLICK_COLUMNS, row))) + b"\n"
+                    for row in rows
+                )
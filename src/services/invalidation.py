@@ -0,0 +1,401 @@
+import asyncio
+import fcntl
+import inspect
+import logging
+import mmap
+import os
+import secrets
+import struct
+import tempfile
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Any, Callable, Iterator
+from urllib.parse import urlparse
+
+from src.core.config import app_settings
+from src.core.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+# (origin, kind, key) of one invalidation
+Message = tuple[int, str, str]
+# called with every key of its kind received in one poll
+Handler = Callable[[set[str]], Any]
+
+
+class InvalidationBackend:
+    """
+    Channel carrying invalidations between workers. fetch returns what
+    other workers published since the previous call, or None when some
+    messages may have been lost and local state has to be dropped.
+    """
+
+    async def publish(self, origin: int, kind: str, key: str) -> None:
+        raise NotImplementedError
+
+    async def fetch(self) -> list[Message] | None:
+        raise NotImplementedError
+
+    async def close(self) -> None:
+        pass
+
+
+class LocalBackend(InvalidationBackend):
+    """Single worker, nothing to tell anyone"""
+
+    async def publish(self, origin: int, kind: str, key: str) -> None:
+        pass
+
+    async def fetch(self) -> list[Message] | None:
+        return []
+
+
+class SharedMemoryBackend(InvalidationBackend):
+    """
+    Ring buffer of fixed size slots in a memory mapped file shared by
+    the workers of one host. Writers take an exclusive flock for the
+    few bytes they touch, readers remember the last sequence number
+    they have seen and fall back to a reset once lapped.
+    """
+
+    HEADER = struct.Struct("<Q")
+    # sequence, origin, payload length, "kind:key" payload
+    SLOT = struct.Struct("<QIB51s")
+
+    def __init__(self, path: str, slots: int = 4096):
+        self.path = path
+        self.slots = slots
+        self._size = self.HEADER.size + self.SLOT.size * slots
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        with self._locked(fcntl.LOCK_EX):
+            if os.fstat(self._fd).st_size < self._size:
+                os.ftruncate(self._fd, self._size)
+        self._map = mmap.mmap(self._fd, self._size)
+        self._seen: int | None = None
+
+    @contextmanager
+    def _locked(self, operation: int) -> Iterator[None]:
+        fcntl.flock(self._fd, operation)
+        try:
+            yield
+        finally:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    def _slot_offset(self, sequence: int) -> int:
+        return self.HEADER.size + (sequence % self.slots) * self.SLOT.size
+
+    async def publish(self, origin: int, kind: str, key: str) -> None:
+        payload = f"{kind}:{key}".encode()
+        if len(payload) > 51:
+            raise ValueError(f"Invalidation key {key!r} is too long")
+        with self._locked(fcntl.LOCK_EX):
+            (sequence,) = self.HEADER.unpack_from(self._map, 0)
+            self.SLOT.pack_into(
+                self._map,
+                self._slot_offset(sequence),
+                sequence,
+                origin,
+                len(payload),
+                payload,
+            )
+            self.HEADER.pack_into(self._map, 0, sequence + 1)
+
+    async def fetch(self) -> list[Message] | None:
+        with self._locked(fcntl.LOCK_SH):
+            (head,) = self.HEADER.unpack_from(self._map, 0)
+            if self._seen is None:
+                self._seen = head
+                return []
+            if head - self._seen > self.slots:
+                self._seen = head
+                return None
+            messages = []
+            for sequence in range(self._seen, head):
+                stored, origin, length, payload = self.SLOT.unpack_from(
+                    self._map, self._slot_offset(sequence)
+                )
+                if stored != sequence:
+                    self._seen = head
+                    return None
+                kind, _, key = payload[:length].decode().partition(":")
+                messages.append((origin, kind, key))
+        self._seen = head
+        return messages
+
+    async def close(self) -> None:
+        self._map.close()
+        os.close(self._fd)
+
+
+class RedisError(Exception):
+    pass
+
+
+class RedisConnection:
+    """Bare RESP2 client, just enough for a few stream commands"""
+
+    def __init__(self, url: str):
+        parsed = urlparse(url)
+        self.host = parsed.hostname or "localhost"
+        self.port = parsed.port or 6379
+        self.password = parsed.password
+        self.db = int(parsed.path.lstrip("/") or 0)
+        self._reader: asyncio.StreamReader | None = None
+        self._writer: asyncio.StreamWriter | None = None
+        self._lock = asyncio.Lock()
+
+    async def _connect(self) -> None:
+        self._reader, self._writer = await asyncio.open_connection(
+            self.host, self.port
+        )
+        if self.password:
+            await self._call("AUTH", self.password)
+        if self.db:
+            await self._call("SELECT", self.db)
+
+    async def execute(self, *args: str | int) -> Any:
+        async with self._lock:
+            if self._writer is None:
+                await self._connect()
+            try:
+                return await self._call(*args)
+            except (OSError, asyncio.IncompleteReadError):
+                await self.close()
+                raise
+
+    async def _call(self, *args: str | int) -> Any:
+        parts = [f"*{len(args)}\r\n".encode()]
+        for arg in args:
+            value = str(arg).encode()
+            parts.append(b"$%d\r\n%s\r\n" % (len(value), value))
+        self._writer.write(b"".join(parts))
+        await self._writer.drain()
+        return await self._read()
+
+    async def _read(self) -> Any:
+        line = (await self._reader.readuntil(b"\r\n"))[:-2]
+        prefix, rest = line[:1], line[1:]
+        if prefix == b"+":
+            return rest.decode()
+        if prefix == b"-":
+            raise RedisError(rest.decode())
+        if prefix == b":":
+            return int(rest)
+        if prefix == b"$":
+            length = int(rest)
+            if length < 0:
+                return None
+            return (await self._reader.readexactly(length + 2))[:-2].decode()
+        if prefix == b"*":
+            length = int(rest)
+            if length < 0:
+                return None
+            return [await self._read() for _ in range(length)]
+        raise RedisError(f"Unexpected reply {line!r}")
+
+    async def close(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+            self._reader = self._writer = None
+
+
+class RedisBackend(InvalidationBackend):
+    """
+    Redis stream shared by workers on any number of hosts, trimmed to
+    about maxlen entries. A dropped connection resets local state since
+    messages may have been missed meanwhile.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        stream: str = "urlshorter:invalidations",
+        maxlen: int = 10000,
+        count: int = 1000,
+    ):
+        self.stream = stream
+        self.maxlen = maxlen
+        self.count = count
+        self._redis = RedisConnection(url)
+        self._last_id: str | None = None
+        self._lost = False
+
+    async def publish(self, origin: int, kind: str, key: str) -> None:
+        await self._redis.execute(
+            "XADD",
+            self.stream,
+            "MAXLEN",
+            "~",
+            self.maxlen,
+            "*",
+            "origin",
+            origin,
+            "kind",
+            kind,
+            "key",
+            key,
+        )
+
+    async def fetch(self) -> list[Message] | None:
+        try:
+            if self._last_id is None:
+                last = await self._redis.execute(
+                    "XREVRANGE", self.stream, "+", "-", "COUNT", 1
+                )
+                self._last_id = last[0][0] if last else "0-0"
+                lost, self._lost = self._lost, False
+                return None if lost else []
+            messages = []
+            while True:
+                reply = await self._redis.execute(
+                    "XREAD",
+                    "COUNT",
+                    self.count,
+                    "STREAMS",
+                    self.stream,
+                    self._last_id,
+                )
+                entries = reply[0][1] if reply else []
+                for id, fields in entries:
+                    values = dict(zip(fields[::2], fields[1::2]))
+                    messages.append(
+                        (int(values["origin"]), values["kind"], values["key"])
+                    )
+                    self._last_id = id
+                if len(entries) < self.count:
+                    return messages
+        except (OSError, asyncio.IncompleteReadError):
+            self._last_id = None
+            self._lost = True
+            raise
+
+    async def close(self) -> None:
+        await self._redis.close()
+
+
+def get_backend(name: str) -> InvalidationBackend:
+    """local, shm or a redis:// URL"""
+    if name.startswith("redis://"):
+        return RedisBackend(name)
+    if name == "shm":
+        path = app_settings.project_invalidation_path or os.path.join(
+            "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir(),
+            "urlshorter-invalidations",
+        )
+        return SharedMemoryBackend(
+            path, app_settings.project_invalidation_slots
+        )
+    if name == "local":
+        return LocalBackend()
+    raise RuntimeError(f"Unknown invalidation backend {name}")
+
+
+class InvalidationBroker:
+    """
+    Fans out invalidations of per-process state (url_cache entries,
+    the blacklist index) to the other workers. Publishers update their
+    own process themselves, everyone else applies the change within
+    interval seconds. Owners of the state subscribe a handler per kind
+    and a reset called when messages may have been lost.
+    """
+
+    def __init__(self, backend: InvalidationBackend, interval: float = 0.5):
+        self.backend = backend
+        self.interval = interval
+        self.origin = secrets.randbits(32)
+        self._handlers: dict[str, Handler] = {}
+        self._resets: list[Callable[[], Any]] = []
+        self._task: asyncio.Task | None = None
+        self.published = 0
+        self.received = 0
+        self.resets = 0
+        self.failures = 0
+
+    def subscribe(
+        self,
+        kind: str,
+        handler: Handler,
+        reset: Callable[[], Any] | None = None,
+    ) -> None:
+        self._handlers[kind] = handler
+        if reset is not None:
+            self._resets.append(reset)
+
+    async def publish(self, kind: str, key: str | int) -> None:
+        """Tell the other workers, failures are left to cache TTLs"""
+        try:
+            await self.backend.publish(self.origin, kind, str(key))
+        except Exception:
+            self.failures += 1
+            logger.exception("Failed to publish %s %s invalidation", kind, key)
+            return
+        self.published += 1
+
+    async def poll(self) -> int:
+        """Apply what other workers published, returns messages applied"""
+        messages = await self.backend.fetch()
+        if messages is None:
+            self.resets += 1
+            logger.warning("Invalidations may have been lost, resetting")
+            for reset in self._resets:
+                await _maybe_await(reset())
+            return 0
+        keys: dict[str, set[str]] = defaultdict(set)
+        for origin, kind, key in messages:
+            if origin != self.origin:
+                keys[kind].add(key)
+        for kind, kind_keys in keys.items():
+            handler = self._handlers.get(kind)
+            if handler is not None:
+                await _maybe_await(handler(kind_keys))
+        applied = sum(len(kind_keys) for kind_keys in keys.values())
+        self.received += applied
+        return applied
+
+    async def run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.poll()
+            except Exception:
+                self.failures += 1
+                logger.exception("Invalidation poll failed")
+
+    async def start(self) -> None:
+        if self._task is None and not isinstance(self.backend, LocalBackend):
+            await self.poll()
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.backend.close()
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "published": self.published,
+            "received": self.received,
+            "resets": self.resets,
+            "failures": self.failures,
+        }
+
+
+async def _maybe_await(result: Any) -> None:
+    if inspect.isawaitable(result):
+        await result
+
+
+invalidation_broker = InvalidationBroker(
+    get_backend(app_settings.project_invalidation_backend),
+    interval=app_settings.project_invalidation_interval,
+)
+registry.register_stats(
+    "invalidation",
+    invalidation_broker.stats,
+    counters=("published", "received", "resets", "failures"),
+)
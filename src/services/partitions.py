@@ -0,0 +1,263 @@
+import asyncio
+import gzip
+import logging
+import os
+import re
+from datetime import datetime
+from typing import Any
+
+import orjson
+from sqlalchemy import Row, delete, func, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.core.config import app_settings
+from src.core.metrics import registry
+from src.db.locks import exclusive_session
+from src.models.models import ShortedURLInfo
+from src.services.user_agents import user_agents
+
+logger = logging.getLogger(__name__)
+
+_info = ShortedURLInfo.__table__
+PARTITION_NAME = re.compile(rf"^{_info.name}_y(\d{{4}})m(\d{{2}})$")
+
+
+def month_start(moment: datetime, months: int = 0) -> datetime:
+    """First instant of the month `months` away from the one of moment"""
+    index = moment.year * 12 + moment.month - 1 + months
+    return datetime(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month: datetime) -> str:
+    return f"{_info.name}_y{month.year}m{month.month:02d}"
+
+
+def _archived(row: Row, user_agents: dict[int, str]) -> dict[str, Any]:
+    click = row._asdict()
+    click["user_agent"] = user_agents.get(click.pop("user_agent_id"))
+    return click
+
+
+class ClickPartitionManager:
+    """
+    Maintenance of shorted_url_info. On Postgres, where migration 05 made
+    it range partitioned by month on created_at, it keeps partitions
+    created ahead_months in advance and detaches and drops the ones past
+    retention. Elsewhere expired months are deleted by range. Either way
+    expired clicks are first archived as gzipped NDJSON, one file per
+    month, when archive_dir is set. Rows that landed in the default
+    partition are left for manual cleanup.
+    """
+
+    def __init__(
+        self,
+        retention_months: int = 0,
+        archive_dir: str = "",
+        ahead_months: int = 2,
+        interval: float = 3600,
+        chunk_size: int = 10000,
+    ):
+        self.retention_months = retention_months
+        self.archive_dir = archive_dir
+        self.ahead_months = ahead_months
+        self.interval = interval
+        self.chunk_size = chunk_size
+        self._task: asyncio.Task | None = None
+        self.created = 0
+        self.expired = 0
+        self.archived = 0
+
+    async def is_partitioned(self, db: AsyncSession) -> bool:
+        connection = await db.connection()
+        if connection.dialect.name != "postgresql":
+            return False
+        result = await db.execute(
+            text(
+                "SELECT 1 FROM pg_partitioned_table p "
+                "JOIN pg_class c ON c.oid = p.partrelid "
+                "WHERE c.relname = :name"
+            ),
+            {"name": _info.name},
+        )
+        return result.first() is not None
+
+    async def partitions(self, db: AsyncSession) -> dict[datetime, str]:
+        """Monthly partitions by month start"""
+        result = await db.execute(
+            text(
+                "SELECT child.relname FROM pg_inherits i "
+                "JOIN pg_class parent ON parent.oid = i.inhparent "
+                "JOIN pg_class child ON child.oid = i.inhrelid "
+                "WHERE parent.relname = :name"
+            ),
+            {"name": _info.name},
+        )
+        months = {}
+        for (name,) in result:
+            match = PARTITION_NAME.match(name)
+            if match:
+                months[datetime(int(match[1]), int(match[2]), 1)] = name
+        return months
+
+    async def ensure_partitions(self, db: AsyncSession, now: datetime) -> int:
+        """Create missing partitions up to ahead_months from now"""
+        existing = await self.partitions(db)
+        created = 0
+        for months in range(self.ahead_months + 1):
+            month = month_start(now, months)
+            if month in existing:
+                continue
+            name = partition_name(month)
+            await db.execute(
+                text(
+                    f'CREATE TABLE IF NOT EXISTS "{name}" '
+                    f'PARTITION OF "{_info.name}" FOR VALUES '
+                    f"FROM ('{month.isoformat()}') "
+                    f"TO ('{month_start(month, 1).isoformat()}')"
+                )
+            )
+            created += 1
+            logger.info("Created click partition %s", name)
+        await db.commit()
+        self.created += created
+        return created
+
+    async def archive(
+        self, db: AsyncSession, since: datetime, until: datetime
+    ) -> int:
+        """Write clicks of [since, until) to the month's archive file"""
+        if not self.archive_dir:
+            return 0
+        os.makedirs(self.archive_dir, exist_ok=True)
+        path = os.path.join(
+            self.archive_dir, f"{partition_name(since)}.ndjson.gz"
+        )
+        statement = (
+            select(*_info.columns)
+            .where(_info.c.created_at >= since, _info.c.created_at < until)
+            .order_by(_info.c.created_at, _info.c.id)
+            .execution_options(yield_per=self.chunk_size)
+        )
+        archived = 0
+        # written aside and renamed, a crash never leaves a partial archive
+        with gzip.open(f"{path}.tmp", "wb") as archive:
+            result = await db.stream(statement)
+            async for rows in result.partitions(self.chunk_size):
+                # archives are read without the database, store the strings
+                values = await user_agents.resolve(
+                    db, {row.user_agent_id for row in rows}
+                )
+                data = b"".join(
+                    orjson.dumps(_archived(row, values)) + b"\n"
+                    for row in rows
+                )
+                await asyncio.to_thread(archive.write, data)
+                archived += len(rows)
+        if not archived:
+            os.remove(f"{path}.tmp")
+            return 0
+        os.replace(f"{path}.tmp", path)
+        self.archived += archived
+        logger.info("Archived %s clicks to %s", archived, path)
+        return archived
+
+    async def expire(self, db: AsyncSession, now: datetime) -> int:
+        """Archive and drop months past retention, returns months dropped"""
+        cutoff = self.cutoff(now)
+        if cutoff is None:
+            return 0
+        if await self.is_partitioned(db):
+            months = await self.partitions(db)
+        else:
+            oldest = await db.scalar(select(func.min(_info.c.created_at)))
+            months = {}
+            month = month_start(oldest) if oldest else cutoff
+            while month < cutoff:
+                months[month] = None
+                month = month_start(month, 1)
+        expired = 0
+        for month, name in sorted(months.items()):
+            until = month_start(month, 1)
+            if until > cutoff:
+                continue
+            await self.archive(db, month, until)
+            if name is not None:
+                await db.execute(
+                    text(
+                        f'ALTER TABLE "{_info.name}" '
+                        f'DETACH PARTITION "{name}"'
+                    )
+                )
+                await db.execute(text(f'DROP TABLE "{name}"'))
+            else:
+                await db.execute(
+                    delete(_info).where(
+                        _info.c.created_at >= month,
+                        _info.c.created_at < until,
+                    )
+                )
+            await db.commit()
+            expired += 1
+            logger.info("Dropped clicks of %s", month.strftime("%Y-%m"))
+        self.expired += expired
+        return expired
+
+    def cutoff(self, now: datetime) -> datetime | None:
+        """
+        Oldest click instant retained: the current month plus
+        retention_months full ones, None keeps everything
+        """
+        if self.retention_months <= 0:
+            return None
+        return month_start(now, -self.retention_months)
+
+    async def run_once(self, now: datetime | None = None) -> None:
+        """One maintenance round, skipped while another worker runs one"""
+        now = now or datetime.utcnow()
+        async with exclusive_session("click_partitions") as db:
+            if db is None:
+                return
+            if await self.is_partitioned(db):
+                await self.ensure_partitions(db, now)
+            await self.expire(db, now)
+
+    async def run(self) -> None:
+        while True:
+            try:
+                await self.run_once()
+            except Exception:
+                logger.exception("Click partition maintenance failed")
+            await asyncio.sleep(self.interval)
+
+    def start(self) -> None:
+        if self._task is None and self.interval > 0:
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "created": self.created,
+            "expired": self.expired,
+            "archived": self.archived,
+        }
+
+
+click_partitions = ClickPartitionManager(
+    retention_months=app_settings.project_click_retention_months,
+    archive_dir=app_settings.project_click_archive_dir,
+    ahead_months=app_settings.project_partition_ahead_months,
+    interval=app_settings.project_partition_interval,
+)
+registry.register_stats(
+    "click_partitions",
+    click_partitions.stats,
+    counters=("created", "expired", "archived"),
+)
@@ -0,0 +1,207 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from ipaddress import ip_address
+from typing import NamedTuple
+
+from src.core.config import app_settings
+from src.core.metrics import registry
+from src.db.db import async_session
+from src.services.blacklist import blacklist_index
+from src.services.invalidation import invalidation_broker
+from src.services.services import blacklist_service
+
+logger = logging.getLogger(__name__)
+
+API_PREFIX = "/api/v1"
+
+
+class RateRule(NamedTuple):
+    name: str
+    # tokens added per second and bucket capacity
+    rate: float
+    burst: float
+
+    @classmethod
+    def parse(cls, name: str, value: str) -> "RateRule | None":
+        """'<requests>/<seconds>', empty or 0 requests disables the rule"""
+        if not value:
+            return None
+        requests, _, seconds = value.partition("/")
+        requests, seconds = float(requests), float(seconds or 1)
+        if requests <= 0:
+            return None
+        return cls(name, requests / seconds, requests)
+
+    @property
+    def refill_time(self) -> float:
+        return self.burst / self.rate
+
+
+def route_rule(method: str, path: str) -> str | None:
+    """Rate limit rule of a request, matched on the raw path"""
+    if method == "POST":
+        if path in (API_PREFIX, f"{API_PREFIX}/"):
+            return "create"
+        if path.startswith(f"{API_PREFIX}/shorten"):
+            return "shorten"
+    elif method == "GET":
+        parts = path.strip("/").split("/")
+        if len(parts) == 1 and parts[0] and parts[0] != "metrics":
+            return "redirect"
+        if f"/{'/'.join(parts[:2])}" == API_PREFIX and len(parts) == 3:
+            if parts[2].isdigit():
+                return "redirect"
+    return None
+
+
+class RateLimiter:
+    """
+    Token buckets per (client, rule) kept in insertion-ordered LRU.
+    Buckets idle for longer than their refill time are full anyway and
+    get dropped from the cold end on every hit, max_buckets caps memory
+    when a scanner rotates addresses faster than that.
+    Clients rejected ban_after times in a row are blacklisted for
+    ban_seconds, the ban is written in the background.
+    """
+
+    def __init__(
+        self,
+        rules: list[RateRule],
+        max_buckets: int = 100000,
+        ban_after: int = 0,
+        ban_seconds: float = 600,
+    ):
+        self.rules = {rule.name: rule for rule in rules}
+        self.max_buckets = max_buckets
+        self.ban_after = ban_after
+        self.ban_seconds = ban_seconds
+        # (host, rule name) -> [tokens, updated at, rejections in a row]
+        self._buckets: OrderedDict[tuple[str, str], list[float]] = (
+            OrderedDict()
+        )
+        self._banning: set[str] = set()
+        self._tasks: set[asyncio.Task] = set()
+        self.allowed = 0
+        self.limited = 0
+        self.evictions = 0
+        self.bans = 0
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+    def hit(self, host: str, name: str, now: float | None = None) -> float:
+        """
+        Take a token for the client, returns 0 when the request may pass
+        or seconds until the next token otherwise
+        """
+        rule = self.rules.get(name)
+        if rule is None:
+            return 0
+        now = time.monotonic() if now is None else now
+        self._evict(now)
+        key = (host, name)
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = [rule.burst, now, 0]
+        else:
+            self._buckets.move_to_end(key)
+            bucket[0] = min(
+                rule.burst, bucket[0] + (now - bucket[1]) * rule.rate
+            )
+            bucket[1] = now
+        if bucket[0] >= 1:
+            bucket[0] -= 1
+            bucket[2] = 0
+            self.allowed += 1
+            return 0
+        bucket[2] += 1
+        self.limited += 1
+        if self.ban_after and bucket[2] >= self.ban_after:
+            self.ban(host)
+        return (1 - bucket[0]) / rule.rate
+
+    def _evict(self, now: float) -> None:
+        while self._buckets:
+            (host, name), bucket = next(iter(self._buckets.items()))
+            if (
+                len(self._buckets) < self.max_buckets
+                and now - bucket[1] < self.rules[name].refill_time
+            ):
+                break
+            self._buckets.popitem(last=False)
+            self.evictions += 1
+
+    def ban(self, host: str) -> None:
+        if host in self._banning:
+            return
+        try:
+            ip_address(host)
+        except ValueError:
+            return
+        self._banning.add(host)
+        task = asyncio.create_task(self._ban(host))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _ban(self, host: str) -> None:
+        until = datetime.now() + timedelta(seconds=self.ban_seconds)
+        try:
+            async with async_session() as db:
+                db_object = await blacklist_service.create(
+                    db=db, object_in={"host": host, "until": until}
+                )
+            blacklist_index.add(db_object.id, db_object.host, until)
+            await invalidation_broker.publish("blacklist", db_object.id)
+            self.bans += 1
+            logger.warning(
+                "Host %s blacklisted until %s for exceeding rate limits",
+                host,
+                until.ctime(),
+            )
+        except Exception:
+            logger.exception("Failed to blacklist host %s", host)
+        finally:
+            self._banning.discard(host)
+            for name in self.rules:
+                self._buckets.pop((host, name), None)
+
+    def clear(self) -> None:
+        self._buckets.clear()
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "buckets": len(self._buckets),
+            "max_buckets": self.max_buckets,
+            "allowed": self.allowed,
+            "limited": self.limited,
+            "evictions": self.evictions,
+            "bans": self.bans,
+        }
+
+
+rate_limiter = RateLimiter(
+    rules=[
+        rule
+        for rule in (
+            RateRule.parse("create", app_settings.project_rate_limit_create),
+            RateRule.parse(
+                "shorten", app_settings.project_rate_limit_shorten
+            ),
+            RateRule.parse(
+                "redirect", app_settings.project_rate_limit_redirect
+            ),
+        )
+        if rule is not None
+    ],
+    max_buckets=app_settings.project_rate_limit_max_buckets,
+    ban_after=app_settings.project_rate_limit_ban_after,
+    ban_seconds=app_settings.project_rate_limit_ban_seconds,
+)
+registry.register_stats(
+    "rate_limit",
+    rate_limiter.stats,
+    counters=("allowed", "limited", "evictions", "bans"),
+)
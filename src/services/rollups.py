@@ -0,0 +1,231 @@
+import asyncio
+import logging
+from collections import Counter
+from datetime import datetime, timedelta
+
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.core.config import app_settings
+from src.db.locks import exclusive_session
+from src.models.models import (
+    ClickRollup,
+    ClickTop,
+    RollupWatermark,
+    ShortedURLInfo,
+)
+from src.services.base import dialect_insert, upsert_increment
+from src.services.user_agents import user_agents
+
+logger = logging.getLogger(__name__)
+
+GRANULARITIES = ("minute", "hour", "day")
+TOP_KINDS = ("user_agent", "host")
+WATERMARK = "clicks"
+
+
+def truncate(moment: datetime, granularity: str) -> datetime:
+    if granularity == "minute":
+        return moment.replace(second=0, microsecond=0)
+    if granularity == "hour":
+        return moment.replace(minute=0, second=0, microsecond=0)
+    if granularity == "day":
+        return moment.replace(hour=0, minute=0, second=0, microsecond=0)
+    raise ValueError(f"Unknown granularity {granularity}")
+
+
+class ClickRollupWorker:
+    """
+    Folds new shorted_url_info rows into click_rollup and click_top.
+    Rows are picked up by id above the stored watermark, aggregated in
+    memory and upserted together with the new watermark in a single
+    transaction, so every click is counted exactly once. Concurrent
+    runs from several workers are serialized by locking the watermark
+    row on Postgres; elsewhere the watermark only moves from the value
+    the batch was read at, a run that lost the race rolls back.
+
+    Writers commit out of id order, a lower id may become visible after
+    a higher one. A batch therefore stops at the first gap in ids while
+    the row after it is younger than settle seconds; older gaps are
+    taken as rolled back inserts or purged rows and skipped. settle has
+    to outlast the click pipeline buffering plus one insert.
+    """
+
+    _watermark = RollupWatermark.__table__
+
+    def __init__(
+        self,
+        interval: float = 10,
+        batch_size: int = 10000,
+        settle: float = 60,
+    ):
+        self.interval = interval
+        self.batch_size = batch_size
+        self.settle = settle
+        self._task: asyncio.Task | None = None
+
+    async def run_once(self, db: AsyncSession) -> int:
+        """Aggregate one batch of new clicks, returns rows processed"""
+        await db.execute(
+            dialect_insert(db, self._watermark).on_conflict_do_nothing(),
+            {"name": WATERMARK, "last_id": 0},
+        )
+        await db.commit()
+        last_id = await db.scalar(
+            select(self._watermark.c.last_id)
+            .where(self._watermark.c.name == WATERMARK)
+            .with_for_update()
+        )
+        statement = (
+            select(
+                ShortedURLInfo.id,
+                ShortedURLInfo.url_id,
+                ShortedURLInfo.created_at,
+                ShortedURLInfo.user_agent_id,
+                ShortedURLInfo.host,
+            )
+            .where(ShortedURLInfo.id > last_id)
+            .order_by(ShortedURLInfo.id)
+            .limit(self.batch_size)
+        )
+        rows = self._settled((await db.execute(statement)).all(), last_id)
+        if not rows:
+            await db.commit()
+            return 0
+        moved = await db.execute(
+            update(self._watermark)
+            .where(
+                self._watermark.c.name == WATERMARK,
+                self._watermark.c.last_id == last_id,
+            )
+            .values(last_id=rows[-1].id)
+        )
+        if moved.rowcount != 1:
+            await db.rollback()
+            return 0
+
+        values = await user_agents.resolve(
+            db, {row.user_agent_id for row in rows}
+        )
+        buckets = Counter()
+        tops = Counter()
+        for _, url_id, created_at, user_agent_id, host in rows:
+            user_agent = values.get(user_agent_id, "unknown")
+            for granularity in GRANULARITIES:
+                buckets[
+                    (url_id, granularity, truncate(created_at, granularity))
+                ] += 1
+            tops[(url_id, "user_agent", user_agent)] += 1
+            tops[(url_id, "host", host)] += 1
+
+        await upsert_increment(
+            db,
+            ClickRollup.__table__,
+            [
+                dict(url_id=url_id, granularity=g, bucket=b, clicks=clicks)
+                for (url_id, g, b), clicks in buckets.items()
+            ],
+            keys=("url_id", "granularity", "bucket"),
+            counter="clicks",
+        )
+        await upsert_increment(
+            db,
+            ClickTop.__table__,
+            [
+                dict(url_id=url_id, kind=kind, value=value, clicks=clicks)
+                for (url_id, kind, value), clicks in tops.items()
+            ],
+            keys=("url_id", "kind", "value"),
+            counter="clicks",
+        )
+        await db.commit()
+        return len(rows)
+
+    def _settled(self, rows: list, last_id: int) -> list:
+        """Leading rows of the batch up to the first unsettled id gap"""
+        cutoff = datetime.utcnow() - timedelta(seconds=self.settle)
+        expected = last_id + 1
+        for index, row in enumerate(rows):
+            if row.id != expected and row.created_at >= cutoff:
+                return rows[:index]
+            expected = row.id + 1
+        return rows
+
+    async def catch_up(self) -> int:
+        """Roll up everything new, unless another worker is at it"""
+        processed = 0
+        async with exclusive_session("click_rollup") as db:
+            if db is None:
+                return 0
+            while True:
+                batch = await self.run_once(db)
+                processed += batch
+                if batch < self.batch_size:
+                    return processed
+
+    async def run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                processed = await self.catch_up()
+            except Exception:
+                logger.exception("Click rollup failed")
+                continue
+            if processed:
+                logger.debug("Rolled up %s clicks", processed)
+
+    def start(self) -> None:
+        if self._task is None and self.interval > 0:
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+async def get_buckets(
+    db: AsyncSession,
+    url_id: int,
+    granularity: str,
+    since: datetime | None = None,
+    until: datetime | None = None,
+) -> list[tuple[datetime, int]]:
+    statement = (
+        select(ClickRollup.bucket, ClickRollup.clicks)
+        .where(
+            ClickRollup.url_id == url_id,
+            ClickRollup.granularity == granularity,
+        )
+        .order_by(ClickRollup.bucket)
+    )
+    if since is not None:
+        statement = statement.where(
+            ClickRollup.bucket >= truncate(since, granularity)
+        )
+    if until is not None:
+        statement = statement.where(ClickRollup.bucket < until)
+    return (await db.execute(statement)).all()
+
+
+async def get_top(
+    db: AsyncSession, url_id: int, kind: str, limit: int = 10
+) -> list[tuple[str, int]]:
+    statement = (
+        select(ClickTop.value, ClickTop.clicks)
+        .where(ClickTop.url_id == url_id, ClickTop.kind == kind)
+        .order_by(ClickTop.clicks.desc(), ClickTop.value)
+        .limit(limit)
+    )
+    return (await db.execute(statement)).all()
+
+
+click_rollup = ClickRollupWorker(
+    interval=app_settings.project_rollup_interval,
+    batch_size=app_settings.project_rollup_batch_size,
+    settle=app_settings.project_rollup_settle,
+)
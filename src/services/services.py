@@ -1,3 +1,9 @@
+from datetime import datetime
+from typing import Any, AsyncIterator, Callable, Sequence
+
+from sqlalchemy import Row, bindparam, delete, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
 from src.models.models import BlacklistedClient as BlacklistedClientModel
 from src.models.models import ShortedURL as ShortedURLModel
 from src.models.models import ShortedURLInfo as ShortedURLInfoModel
@@ -5,22 +11,294 @@ from src.schemas.blacklist import BlacklistedClientCreate
 from src.schemas.shorted_url_info import ShortURLInfoCreate
 from src.schemas.shorted_url import ShortedURLCreate, ShortedURLUpdate
 
-from .base import RepositoryDB
+from .base import RepositoryDB, dialect_insert
+from .bloom import link_filter
+from .cache import Link, url_cache
+from .invalidation import invalidation_broker
+from .partitions import click_partitions
+from .shorter import (
+    MAX_COLLISION_ROUNDS,
+    code_to_id,
+    ensure_unique,
+    short_url_rows,
+)
+from .user_agents import user_agents
+
+# (id, short url) of a stored original
+ShortRef = tuple[int, str]
+
+_shorted_url = ShortedURLModel.__table__
+# Core statement built once, its compiled form is reused from the cache
+_lookup_statement = select(
+    _shorted_url.c.original, _shorted_url.c.deleted, _shorted_url.c.code
+).where(_shorted_url.c.id == bindparam("id"))
+_code_lookup_statement = select(
+    _shorted_url.c.id, _shorted_url.c.original, _shorted_url.c.deleted
+).where(_shorted_url.c.code == bindparam("code"))
 
 
 class RepositoryShortedURL(
     RepositoryDB[ShortedURLModel, ShortURLInfoCreate, ShortedURLUpdate]
 ):
-    pass
+    async def lookup(
+        self, db: AsyncSession, id: int
+    ) -> tuple[str, bool | None, str | None] | None:
+        """
+        (original, deleted, code) of a short URL as a plain row, skipping
+        ORM entity loading and the identity map
+        """
+        connection = await db.connection()
+        result = await connection.execute(_lookup_statement, {"id": id})
+        return result.first()
+
+    async def get_link(self, db: AsyncSession, id: int) -> Link | None:
+        """
+        Redirect data for a short URL, served from url_cache if possible.
+        Ids the link filter knows to be missing never reach the DB.
+        """
+        link = url_cache.get(id)
+        if link is not None:
+            return link
+        if link_filter.known_missing(id):
+            return None
+        link = await self.load_link(db=db, id=id)
+        if link is None:
+            link_filter.miss(id)
+        return link
+
+    async def load_link(self, db: AsyncSession, id: int) -> Link | None:
+        row = await self.lookup(db=db, id=id)
+        if row is None:
+            return None
+        link = Link(id, row[0], bool(row[1]), row[2])
+        url_cache.set(id, link)
+        return link
+
+    async def get_link_by_code(
+        self, db: AsyncSession, code: str
+    ) -> Link | None:
+        """
+        Redirect data for a short code. Codes that encode their row id
+        go through url_cache and the primary key, the rest through the
+        unique code index; recently missed codes skip the index.
+        """
+        id = code_to_id(code)
+        if id is not None:
+            link = await self.get_link(db=db, id=id)
+            if link is not None and link.code == code:
+                return link
+        if link_filter.known_missing(code):
+            return None
+        connection = await db.connection()
+        result = await connection.execute(
+            _code_lookup_statement, {"code": code}
+        )
+        row = result.first()
+        if row is None:
+            link_filter.miss(code)
+            return None
+        link = Link(row[0], row[1], bool(row[2]), code)
+        url_cache.set(link.id, link)
+        return link
+
+    async def prime_cache(self, db: AsyncSession, limit: int) -> int:
+        """Load the most clicked links into url_cache"""
+        statement = (
+            select(
+                self._model.id,
+                self._model.original,
+                self._model.deleted,
+                self._model.code,
+            )
+            .order_by(self._model.clicks.desc())
+            .limit(limit)
+        )
+        result = await db.execute(statement=statement)
+        loaded = 0
+        for id, original, deleted, code in result:
+            url_cache.set(id, Link(id, original, bool(deleted), code))
+            loaded += 1
+        return loaded
+
+    async def get_clicks(self, db: AsyncSession, id: int) -> int:
+        statement = select(self._model.clicks).where(self._model.id == id)
+        result = await db.execute(statement=statement)
+        return result.scalar_one_or_none() or 0
+
+    async def get_by_originals(
+        self, db: AsyncSession, originals: list[str]
+    ) -> dict[str, ShortRef]:
+        statement = select(
+            self._model.id, self._model.value, self._model.original
+        ).where(self._model.original.in_(originals))
+        result = await db.execute(statement=statement)
+        return {original: (id, value) for id, value, original in result}
+
+    async def insert_missing(
+        self, db: AsyncSession, objects_in: list[dict[str, Any]]
+    ) -> dict[str, ShortRef]:
+        """
+        Multi-row INSERT ... ON CONFLICT DO NOTHING, rows clashing with
+        an existing original or value are silently left out
+        """
+        if not objects_in:
+            return {}
+        statement = (
+            dialect_insert(db, self._model.__table__)
+            .on_conflict_do_nothing()
+            .returning(
+                self._model.id,
+                self._model.value,
+                self._model.original,
+                self._model.code,
+            )
+        )
+        result = await db.execute(statement, objects_in)
+        refs = {}
+        for id, value, original, code in result:
+            link_filter.add(id, code)
+            refs[original] = (id, value)
+        return refs
+
+    async def bulk_get_or_create(
+        self,
+        db: AsyncSession,
+        originals: list[str],
+        generate: Callable[..., str],
+        *,
+        chunk_size: int = 1000,
+    ) -> list[ShortRef]:
+        """
+        Short URLs for every original in input order, creating missing
+        ones. Each chunk costs one lookup and one INSERT, plus a retry
+        round only for rows lost to a concurrent insert or code clash.
+        """
+        unique = list(dict.fromkeys(originals))
+        refs: dict[str, ShortRef] = {}
+        for offset in range(0, len(unique), chunk_size):
+            chunk = unique[offset: offset + chunk_size]
+            refs.update(await self.get_by_originals(db, chunk))
+            missing = [original for original in chunk if original not in refs]
+            for attempt in range(MAX_COLLISION_ROUNDS):
+                if not missing:
+                    break
+                if attempt:
+                    refs.update(await self.get_by_originals(db, missing))
+                    missing = [o for o in missing if o not in refs]
+                values = [generate(original, attempt) for original in missing]
+                values = await ensure_unique(db, missing, values)
+                refs.update(
+                    await self.insert_missing(
+                        db, short_url_rows(missing, values)
+                    )
+                )
+                missing = [o for o in missing if o not in refs]
+            await db.commit()
+            if missing:
+                raise RuntimeError("Could not store short URLs")
+        return [refs[original] for original in originals]
+
+    async def create(
+        self, db: AsyncSession, *, object_in: dict[str, Any]
+    ) -> ShortedURLModel:
+        db_object = await super().create(db=db, object_in=object_in)
+        link_filter.add(db_object.id, db_object.code)
+        return db_object
+
+    async def update(
+        self,
+        db: AsyncSession,
+        *,
+        db_object: ShortedURLModel,
+        object_in: ShortedURLUpdate | dict[str, Any],
+    ) -> ShortedURLModel:
+        db_object = await super().update(
+            db=db, db_object=db_object, object_in=object_in
+        )
+        url_cache.invalidate(db_object.id)
+        await invalidation_broker.publish("link", db_object.id)
+        return db_object
 
 
 short_url_service = RepositoryShortedURL(ShortedURLModel)
 
 
+def _invalidate_links(ids: set[str]) -> None:
+    for id in ids:
+        url_cache.invalidate(int(id))
+
+
+invalidation_broker.subscribe(
+    "link", _invalidate_links, reset=url_cache.clear
+)
+
+
 class RepositoryShortedURLInfo(
     RepositoryDB[ShortedURLInfoModel, ShortedURLCreate, None]
 ):
-    pass
+    """
+    History reads never reach past click retention, so Postgres prunes
+    expired partitions even before maintenance drops them. Clicks store
+    user agents by id, reads put the strings back from the dictionary.
+    """
+
+    def _since(self, since: datetime | None) -> datetime | None:
+        cutoff = click_partitions.cutoff(datetime.utcnow())
+        if cutoff is None:
+            return since
+        return cutoff if since is None else max(since, cutoff)
+
+    async def _with_user_agents(
+        self, db: AsyncSession, objects: list[ShortedURLInfoModel]
+    ) -> list[ShortedURLInfoModel]:
+        values = await user_agents.resolve(
+            db, {db_object.user_agent_id for db_object in objects}
+        )
+        for db_object in objects:
+            db_object.user_agent = values.get(db_object.user_agent_id)
+        return objects
+
+    async def get_multi(
+        self, db: AsyncSession, *, since: datetime | None = None, **kwargs
+    ) -> list[ShortedURLInfoModel]:
+        return await self._with_user_agents(
+            db,
+            await super().get_multi(db, since=self._since(since), **kwargs),
+        )
+
+    async def get_page(
+        self, db: AsyncSession, *, since: datetime | None = None, **kwargs
+    ) -> list[ShortedURLInfoModel]:
+        return await self._with_user_agents(
+            db, await super().get_page(db, since=self._since(since), **kwargs)
+        )
+
+    async def stream(
+        self,
+        db: AsyncSession,
+        *,
+        columns: Sequence[str],
+        since: datetime | None = None,
+        **kwargs,
+    ) -> AsyncIterator[Sequence[Row]]:
+        if "user_agent" not in columns:
+            async for rows in super().stream(
+                db, columns=columns, since=self._since(since), **kwargs
+            ):
+                yield rows
+            return
+        index = list(columns).index("user_agent")
+        stored = [*columns[:index], "user_agent_id", *columns[index + 1:]]
+        async for rows in super().stream(
+            db, columns=stored, since=self._since(since), **kwargs
+        ):
+            values = await user_agents.resolve(
+                db, {row[index] for row in rows}
+            )
+            yield [
+                (*row[:index], values.get(row[index]), *row[index + 1:])
+                for row in rows
+            ]
 
 
 url_info_service = RepositoryShortedURLInfo(ShortedURLInfoModel)
@@ -29,7 +307,12 @@ url_info_service = RepositoryShortedURLInfo(ShortedURLInfoModel)
 class RepositoryBlacklist(
     RepositoryDB[BlacklistedClientModel, BlacklistedClientCreate, None]
 ):
-    pass
+    async def purge_expired(self, db: AsyncSession, *, now: datetime) -> int:
+        """Bulk delete of expired bans, served by the until index"""
+        statement = delete(self._model).where(self._model.until <= now)
+        result = await db.execute(statement=statement)
+        await db.commit()
+        return result.rowcount
 
 
 blacklist_service = RepositoryBlacklist(BlacklistedClientModel)
\ No newline at end of file
@@ -1,18 +1,307 @@
+import fcntl
+import hashlib
 import logging
+import os
+import secrets
+import tempfile
+import threading
+import time
+from functools import lru_cache
+from typing import Any, Iterable
 
-import pyshorteners
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from src.core.config import app_settings
+from src.models.models import ShortedURL
 
 logger = logging.getLogger(__name__)
 
+BASE62_ALPHABET = (
+    "0123456789abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ"
+)
+MAX_COLLISION_ROUNDS = 5
+LOOKUP_CHUNK_SIZE = 1000
+MAX_ID = 2**63 - 1
 
-def generate_short_url(original: str) -> str:
-    shortener = getattr(
-        pyshorteners.Shortener(), app_settings.project_shortener, None
+
+def encode(number: int, alphabet: str = BASE62_ALPHABET) -> str:
+    if number < 0:
+        raise ValueError("Only non-negative numbers can be encoded")
+    base = len(alphabet)
+    digits = []
+    while True:
+        number, remainder = divmod(number, base)
+        digits.append(alphabet[remainder])
+        if not number:
+            break
+    return "".join(reversed(digits))
+
+
+def decode(code: str, alphabet: str = BASE62_ALPHABET) -> int:
+    base = len(alphabet)
+    number = 0
+    for char in code:
+        index = alphabet.find(char)
+        if index < 0:
+            raise ValueError(f"Unexpected character {char!r} in code")
+        number = number * base + index
+    return number
+
+
+# slot files flocked by live workers, kept open for the process lifetime
+_claimed_slots: list[int] = []
+
+
+def claim_worker_id(bits: int, base: int = 0) -> int:
+    """
+    Lowest id from base up not held by another live process on this
+    host, claimed with an flock on a per-id file. The kernel drops the
+    lock when the process dies, so ids of dead workers are reused.
+    """
+    directory = (
+        "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
     )
-    if shortener is None:
-        raise RuntimeError("Shortener is not configured or incorrect")
-    short = shortener.short(url=original)
-    logger.info(f"url shortened: {original} -> {short}")
+    for worker_id in range(base, 1 << bits):
+        fd = os.open(
+            os.path.join(directory, f"urlshorter-worker-{worker_id}"),
+            os.O_RDWR | os.O_CREAT,
+            0o600,
+        )
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(fd)
+            continue
+        _claimed_slots.append(fd)
+        return worker_id
+    raise RuntimeError(f"No free short code worker id from {base}")
+
+
+class CodeGenerator:
+    """In-process short code engine"""
+
+    # whether generated codes may clash with already stored ones
+    collision_prone: bool = False
+    # whether decoding a code gives the primary key of its row
+    code_is_id: bool = False
+
+    def generate(self, original: str, attempt: int = 0) -> str:
+        raise NotImplementedError
+
+    def short_url(self, original: str, attempt: int = 0) -> str:
+        code = self.generate(original, attempt)
+        return f"{app_settings.project_short_url_base}{code}"
+
+
+class SequenceCodeGenerator(CodeGenerator):
+    """
+    Snowflake-like sequence: milliseconds since epoch, worker id and
+    a per-millisecond counter packed into one integer, encoded in base62.
+    Worker ids are claimed per host (see claim_worker_id), hosts sharing
+    a database get disjoint ranges through PROJECT_CODE_WORKER_BASE.
+    Unique without any lookups, the integer doubles as the row id so
+    resolving a code needs no index.
+    Stays below 2**53 (safe for JSON clients) until 2040.
+    """
+
+    EPOCH_MS = 1672531200000  # 2023-01-01
+    WORKER_BITS = 6
+    COUNTER_BITS = 8
+
+    code_is_id = True
+
+    def __init__(
+        self, alphabet: str = BASE62_ALPHABET, worker_id: int | None = None
+    ):
+        self._alphabet = alphabet
+        if worker_id is None:
+            worker_id = claim_worker_id(
+                self.WORKER_BITS, app_settings.project_code_worker_base
+            )
+        if not 0 <= worker_id < 1 << self.WORKER_BITS:
+            raise ValueError(f"Worker id {worker_id} is out of range")
+        self._worker_id = worker_id
+        self._lock = threading.Lock()
+        self._last_ms = -1
+        self._counter = 0
+
+    def next_id(self) -> int:
+        with self._lock:
+            now_ms = time.time_ns() // 1_000_000 - self.EPOCH_MS
+            if now_ms <= self._last_ms:
+                now_ms = self._last_ms
+                self._counter = (self._counter + 1) & (
+                    (1 << self.COUNTER_BITS) - 1
+                )
+                if not self._counter:
+                    # counter overflow, borrow the next millisecond
+                    now_ms += 1
+            else:
+                self._counter = 0
+            self._last_ms = now_ms
+            return (
+                (now_ms << (self.WORKER_BITS + self.COUNTER_BITS))
+                | (self._worker_id << self.COUNTER_BITS)
+                | self._counter
+            )
+
+    def generate(self, original: str, attempt: int = 0) -> str:
+        return encode(self.next_id(), self._alphabet)
+
+
+class RandomCodeGenerator(CodeGenerator):
+    collision_prone = True
+
+    def __init__(self, alphabet: str = BASE62_ALPHABET, length: int = 7):
+        self._alphabet = alphabet
+        self._length = length
+
+    def generate(self, original: str, attempt: int = 0) -> str:
+        return "".join(
+            secrets.choice(self._alphabet) for _ in range(self._length)
+        )
+
+
+class HashCodeGenerator(CodeGenerator):
+    """Deterministic code from a digest of the original URL"""
+
+    collision_prone = True
+
+    def __init__(self, alphabet: str = BASE62_ALPHABET, length: int = 7):
+        self._alphabet = alphabet
+        self._length = length
+
+    def generate(self, original: str, attempt: int = 0) -> str:
+        digest = hashlib.blake2b(
+            f"{attempt}:{original}".encode(), digest_size=16
+        ).digest()
+        code = encode(int.from_bytes(digest, "big"), self._alphabet)
+        return code[: self._length]
+
+
+class ExternalShortener(CodeGenerator):
+    """Remote shortening service from pyshorteners, does network I/O"""
+
+    def __init__(self, name: str):
+        try:
+            import pyshorteners
+        except ImportError as error:
+            raise RuntimeError(
+                "pyshorteners is required for external shorteners"
+            ) from error
+        self._shortener = getattr(pyshorteners.Shortener(), name, None)
+        if self._shortener is None:
+            raise RuntimeError("Shortener is not configured or incorrect")
+
+    def short_url(self, original: str, attempt: int = 0) -> str:
+        return self._shortener.short(url=original)
+
+
+GENERATORS = {
+    "sequence": SequenceCodeGenerator,
+    "random": RandomCodeGenerator,
+    "hash": HashCodeGenerator,
+}
+
+
+@lru_cache
+def get_generator(name: str | None = None) -> CodeGenerator:
+    name = name or app_settings.project_shortener
+    if name == "sequence":
+        return SequenceCodeGenerator(app_settings.project_short_code_alphabet)
+    if name in GENERATORS:
+        return GENERATORS[name](
+            app_settings.project_short_code_alphabet,
+            app_settings.project_short_code_length,
+        )
+    return ExternalShortener(name)
+
+
+def generate_short_url(original: str, attempt: int = 0) -> str:
+    short = get_generator().short_url(original, attempt)
+    logger.debug("url shortened: %s -> %s", original, short)
     return short
+
+
+def split_code(value: str) -> str | None:
+    """Code of a short URL served by this service, None for external ones"""
+    base = app_settings.project_short_url_base
+    if value.startswith(base) and len(value) > len(base):
+        return value[len(base):]
+    return None
+
+
+def code_to_id(code: str) -> int | None:
+    """Row id encoded in the code by the configured generator, if any"""
+    if not get_generator().code_is_id:
+        return None
+    try:
+        id = decode(code, app_settings.project_short_code_alphabet)
+    except ValueError:
+        return None
+    return id if id <= MAX_ID else None
+
+
+def short_url_rows(
+    originals: list[str], values: list[str]
+) -> list[dict[str, Any]]:
+    """
+    Rows to insert for new short URLs, with explicit ids when the
+    codes encode them
+    """
+    rows = []
+    for original, value in zip(originals, values):
+        code = split_code(value)
+        rows.append(
+            {
+                "value": value,
+                "original": original,
+                "code": code,
+                "id": code_to_id(code) if code else None,
+            }
+        )
+    # an INSERT takes either ids for all rows or for none of them
+    if any(row["id"] is None for row in rows):
+        for row in rows:
+            del row["id"]
+    return rows
+
+
+async def ensure_unique(
+    db: AsyncSession, originals: list[str], values: list[str]
+) -> list[str]:
+    """
+    Regenerate short URLs that are already taken or repeat inside the batch.
+    One lookup per round, no-op for collision free generators.
+    """
+    if not get_generator().collision_prone:
+        return values
+    values = list(values)
+    pending = range(len(values))
+    for attempt in range(1, MAX_COLLISION_ROUNDS + 1):
+        taken = await _taken_values(db, (values[i] for i in pending))
+        seen = set()
+        clashed = []
+        for index, value in enumerate(values):
+            if value in taken or value in seen:
+                clashed.append(index)
+            seen.add(value)
+        if not clashed:
+            return values
+        for index in clashed:
+            values[index] = generate_short_url(originals[index], attempt)
+        pending = clashed
+    raise RuntimeError("Could not generate unique short URL")
+
+
+async def _taken_values(db: AsyncSession, values: Iterable[str]) -> set[str]:
+    values = list(values)
+    taken = set()
+    for offset in range(0, len(values), LOOKUP_CHUNK_SIZE):
+        chunk = values[offset: offset + LOOKUP_CHUNK_SIZE]
+        statement = select(ShortedURL.value).where(
+            ShortedURL.value.in_(chunk)
+        )
+        taken.update((await db.scalars(statement)).all())
+    return taken
@@ -0,0 +1,140 @@
+import csv
+import logging
+from typing import AsyncIterator, NamedTuple
+
+import orjson
+from pydantic import ValidationError
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.responses import StreamingResponse
+from starlette.types import Receive, Scope, Send
+
+from src.db.db import async_session
+from src.schemas.shorted_url import ShortedURLCreate
+from src.services.services import short_url_service
+from src.services.shorter import generate_short_url
+
+logger = logging.getLogger(__name__)
+
+
+class UploadLine(NamedTuple):
+    line: int
+    original: str | None
+    error: str | None = None
+
+
+class RequestBodyStreamingResponse(StreamingResponse):
+    """
+    StreamingResponse that leaves `receive` to the body iterator, so the
+    response can be streamed while the request body is still being read
+    """
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        await self.stream_response(send)
+        if self.background is not None:
+            await self.background()
+
+
+async def iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    """Split a byte stream into lines without reading it whole"""
+    tail = b""
+    async for chunk in chunks:
+        lines = (tail + chunk).split(b"\n")
+        tail = lines.pop()
+        for line in lines:
+            yield line.decode(errors="replace").rstrip("\r")
+    if tail:
+        yield tail.decode(errors="replace").rstrip("\r")
+
+
+def _validate(number: int, value) -> UploadLine:
+    try:
+        url = ShortedURLCreate(original_url=value)
+    except ValidationError as error:
+        return UploadLine(number, None, error.errors()[0]["msg"])
+    return UploadLine(number, str(url.original_url))
+
+
+async def parse_ndjson(
+    lines: AsyncIterator[str],
+) -> AsyncIterator[UploadLine]:
+    number = 0
+    async for line in lines:
+        number += 1
+        if not line.strip():
+            continue
+        try:
+            item = orjson.loads(line)
+        except orjson.JSONDecodeError:
+            yield UploadLine(number, None, "Invalid JSON")
+            continue
+        if isinstance(item, dict):
+            item = item.get("original_url")
+        yield _validate(number, item)
+
+
+async def parse_csv(lines: AsyncIterator[str]) -> AsyncIterator[UploadLine]:
+    """URL is taken from the original_url column or the first one"""
+    number = 0
+    column = 0
+    async for line in lines:
+        number += 1
+        if not line.strip():
+            continue
+        row = next(csv.reader([line]))
+        if number == 1 and "original_url" in row:
+            column = row.index("original_url")
+            continue
+        if column >= len(row):
+            yield UploadLine(number, None, "Missing original_url column")
+            continue
+        yield _validate(number, row[column].strip())
+
+
+PARSERS = {
+    "ndjson": parse_ndjson,
+    "csv": parse_csv,
+}
+
+
+async def shorten_stream(
+    chunks: AsyncIterator[bytes],
+    format: str = "ndjson",
+    chunk_size: int = 1000,
+) -> AsyncIterator[bytes]:
+    """
+    Shorten URLs read line by line from an upload, storing them chunk_size
+    at a time and answering with one NDJSON result per input line
+    """
+    lines = PARSERS[format](iter_lines(chunks))
+    async with async_session() as db:
+        batch: list[UploadLine] = []
+        async for item in lines:
+            batch.append(item)
+            if len(batch) >= chunk_size:
+                yield await _store(db, batch)
+                batch = []
+        if batch:
+            yield await _store(db, batch)
+
+
+async def _store(db: AsyncSession, batch: list[UploadLine]) -> bytes:
+    valid = [item for item in batch if item.error is None]
+    refs = iter(
+        await short_url_service.bulk_get_or_create(
+            db, [item.original for item in valid], generate_short_url
+        )
+    )
+    results = []
+    for item in batch:
+        if item.error is None:
+            short_id, short_url = next(refs)
+            result = {
+                "line": item.line,
+                "original_url": item.original,
+                "short_id": short_id,
+                "short_url": short_url,
+            }
+        else:
+            result = {"line": item.line, "error": item.error}
+        results.append(orjson.dumps(result))
+    return b"\n".join(results) + b"\n"
@@ -0,0 +1,106 @@
+from typing import Iterable
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.core.config import app_settings
+from src.core.metrics import registry
+from src.db.db import async_session
+from src.models.models import UserAgent
+from src.services.base import dialect_insert
+from src.services.cache import LRUCache
+
+
+class UserAgentDictionary:
+    """
+    Interning of user agent strings into the user_agent table, clicks
+    store the id instead of repeating the string. Both directions are
+    kept in bounded in-process caches: rows never change once stored,
+    so entries need neither TTL nor cross-worker invalidation.
+    """
+
+    _table = UserAgent.__table__
+
+    def __init__(self, maxsize: int = 10000):
+        self._ids: LRUCache[str, int] = LRUCache(maxsize=maxsize)
+        self._values: LRUCache[int, str] = LRUCache(maxsize=maxsize)
+
+    def _remember(self, id: int, value: str) -> None:
+        self._ids.set(value, id)
+        self._values.set(id, value)
+
+    async def intern(self, values: Iterable[str]) -> dict[str, int]:
+        """
+        Ids of values, storing the new ones with a multi-row INSERT ...
+        ON CONFLICT DO NOTHING. That runs and commits in a short session
+        of its own: new ids are durable before they are cached, and the
+        caller's transaction is left alone.
+        """
+        ids = {}
+        missing = []
+        for value in set(values):
+            id = self._ids.get(value)
+            if id is None:
+                missing.append(value)
+            else:
+                ids[value] = id
+        if not missing:
+            return ids
+        async with async_session() as db:
+            await db.execute(
+                dialect_insert(db, self._table).on_conflict_do_nothing(),
+                [{"value": value} for value in missing],
+            )
+            result = await db.execute(
+                select(self._table.c.id, self._table.c.value).where(
+                    self._table.c.value.in_(missing)
+                )
+            )
+            rows = result.all()
+            await db.commit()
+        for id, value in rows:
+            self._remember(id, value)
+            ids[value] = id
+        return ids
+
+    async def resolve(
+        self, db: AsyncSession, ids: Iterable[int]
+    ) -> dict[int, str]:
+        """Strings behind ids, unknown ones are left out"""
+        values = {}
+        missing = []
+        for id in set(ids):
+            value = self._values.get(id)
+            if value is None:
+                missing.append(id)
+            else:
+                values[id] = value
+        if missing:
+            result = await db.execute(
+                select(self._table.c.id, self._table.c.value).where(
+                    self._table.c.id.in_(missing)
+                )
+            )
+            for id, value in result:
+                self._remember(id, value)
+                values[id] = value
+        return values
+
+    def clear(self) -> None:
+        self._ids.clear()
+        self._values.clear()
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "size": len(self._values),
+            "hits": self._ids.hits + self._values.hits,
+            "misses": self._ids.misses + self._values.misses,
+        }
+
+
+user_agents = UserAgentDictionary(
+    maxsize=app_settings.project_user_agent_cache_size
+)
+registry.register_stats(
+    "user_agents", user_agents.stats, counters=("hits", "misses")
+)
@@ -14,6 +14,11 @@ from sqlalchemy.orm import sessionmaker
 
 from src.db.db import Base
 from src.main import app
+from src.services.blacklist import blacklist_index
+from src.services.bloom import link_filter
+from src.services.cache import url_cache
+from src.services.ratelimit import rate_limiter
+from src.services.user_agents import user_agents
 
 
 @pytest.fixture(scope="session")
@@ -63,6 +68,15 @@ async def session(
         yield session
 
 
+@pytest.fixture(autouse=True)
+def clear_caches() -> None:
+    url_cache.clear()
+    blacklist_index.clear()
+    link_filter.clear()
+    rate_limiter.clear()
+    user_agents.clear()
+
+
 @pytest.fixture
 async def api_client(session) -> AsyncGenerator[AsyncClient, None]:
     async with AsyncClient(app=app, base_url="http://test") as client:
@@ -2,6 +2,7 @@ import factory
 
 from src.db.db import async_session
 from src.models.models import BlacklistedClient, ShortedURL, ShortedURLInfo
+from src.services.user_agents import user_agents
 
 
 class AsyncModelFactory(factory.alchemy.SQLAlchemyModelFactory):
@@ -44,6 +45,17 @@ class ShortedURLInfoFactory(AsyncModelFactory):
         model = ShortedURLInfo
         sqlalchemy_session = async_session
 
+    @classmethod
+    def _save(cls, model_class, session, args, kwargs):
+        async def create_coro(*args, **kwargs):
+            ids = await user_agents.intern([kwargs["user_agent"]])
+            kwargs["user_agent_id"] = ids[kwargs["user_agent"]]
+            return await super(ShortedURLInfoFactory, cls)._save(
+                model_class, session, args, kwargs
+            )
+
+        return create_coro(*args, **kwargs)
+
 
 class BlacklistClientFactory(AsyncModelFactory):
     host = factory.Faker("ipv4")
@@ -0,0 +1,72 @@
+import asyncio
+import itertools
+
+
+class FakeRedis:
+    """In-process server speaking just enough RESP2 for stream commands"""
+
+    def __init__(self):
+        self.streams: dict[str, list[tuple[str, list[str]]]] = {}
+        self._ids = itertools.count(1)
+        self._server: asyncio.AbstractServer | None = None
+        self.port = 0
+
+    async def start(self) -> None:
+        self._server = await asyncio.start_server(
+            self._serve, "127.0.0.1", 0
+        )
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def stop(self) -> None:
+        self._server.close()
+        await self._server.wait_closed()
+
+    @property
+    def url(self) -> str:
+        return f"redis://127.0.0.1:{self.port}/0"
+
+    async def _serve(self, reader, writer) -> None:
+        try:
+            while True:
+                header = await reader.readuntil(b"\r\n")
+                args = []
+                for _ in range(int(header[1:-2])):
+                    length = int((await reader.readuntil(b"\r\n"))[1:-2])
+                    args.append((await reader.readexactly(length + 2))[:-2])
+                reply = self._command([arg.decode() for arg in args])
+                writer.write(self._encode(reply))
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            writer.close()
+
+    def _command(self, args: list[str]):
+        name = args[0].upper()
+        if name == "XADD":
+            stream = self.streams.setdefault(args[1], [])
+            id = f"{next(self._ids)}-0"
+            stream.append((id, args[args.index("*") + 1:]))
+            return id
+        if name == "XREVRANGE":
+            stream = self.streams.get(args[1], [])
+            return [list(entry) for entry in stream[-1:]]
+        if name == "XREAD":
+            count = int(args[args.index("COUNT") + 1])
+            stream, last = args[-2], args[-1]
+            after = int(last.split("-")[0])
+            entries = [
+                list(entry)
+                for entry in self.streams.get(stream, [])
+                if int(entry[0].split("-")[0]) > after
+            ][:count]
+            return [[stream, entries]] if entries else None
+        return "OK"
+
+    def _encode(self, value) -> bytes:
+        if value is None:
+            return b"*-1\r\n"
+        if isinstance(value, list):
+            return b"*%d\r\n" % len(value) + b"".join(
+                self._encode(item) for item in value
+            )
+        data = str(value).encode()
+        return b"$%d\r\n%s\r\n" % (len(data), data)
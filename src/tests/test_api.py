@@ -1,11 +1,24 @@
+import asyncio
+import csv
+import io
+import json
 from datetime import datetime, timedelta
 from typing import AsyncGenerator
 
 import pytest
 from fastapi import status
+from httpx import ASGITransport, AsyncClient
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from src.db.db import async_session
-from src.main import app
+from src.main import app, lifespan, warm_up
+from src.models.models import ClickRollup
+from src.services.blacklist import blacklist_index
+from src.services.cache import url_cache
+from src.services.clicks import click_pipeline
+from src.services.rollups import click_rollup, get_buckets
+from src.services.shorter import decode
 from src.services.services import (
     blacklist_service,
     short_url_service,
@@ -30,11 +43,29 @@ SHORT_URL_STATUS_URL = app.url_path_for(
     "read_short_url_info_history", id="{id}"
 )
 SHORT_URL_SHORTEN_URL = app.url_path_for("bulk_create_short_url")
+SHORT_URL_SHORTEN_STREAM_URL = app.url_path_for(
+    "stream_bulk_create_short_url"
+)
+SHORT_URL_ANALYTICS_URL = app.url_path_for(
+    "read_short_url_analytics", id="{id}"
+)
+SHORT_URL_EXPORT_URL = app.url_path_for(
+    "export_short_url_info_history", id="{id}"
+)
+CACHE_STATS_URL = app.url_path_for("cache_stats")
+DB_STATS_URL = app.url_path_for("db_stats")
+METRICS_URL = app.url_path_for("metrics")
+SHORT_CODE_URL = app.url_path_for("redirect_short_code", code="{code}")
 TEST_URL = "https://www.ya.ru/"
 TEST_SHORT_URL = "{url}/not-really-short/"
 TEST_IP = "198.51.111.42"
 
 
+def client_from(host: str) -> AsyncClient:
+    transport = ASGITransport(app=app, client=(host, 123))
+    return AsyncClient(transport=transport, base_url="http://test")
+
+
 class TestBlacklistAPIs:
     @pytest.fixture
     async def create_blacklist(self):
@@ -47,20 +78,36 @@ class TestBlacklistAPIs:
         async with async_session() as db:
             await blacklist_service.delete(db=db)
 
-    async def test_blacklist_middleware(self, api_client, mocker):
+    async def test_blacklist_middleware(self):
         await BlacklistClientFactory(
             host=TEST_IP, until=datetime.now() + timedelta(hours=1)
         )
-        mock_client = mocker.patch("fastapi.Request.client")
-        mock_client.host = TEST_IP
+        await blacklist_index.reload()
 
-        response = await api_client.get(BLACKLIST_LIST_URL)
+        async with client_from(TEST_IP) as api_client:
+            response = await api_client.get(BLACKLIST_LIST_URL)
 
         assert response.status_code == status.HTTP_403_FORBIDDEN
         assert response.json() == {
             "detail": "You`ve been temporary blacklisted"
         }
 
+    async def test_blacklist_network(self, api_client):
+        data = {
+            "host": "198.51.0.0/16",
+            "until": (datetime.now() + timedelta(hours=1)).isoformat(),
+        }
+        response = await api_client.post(BLACKLIST_LIST_URL, json=data)
+
+        async with client_from(TEST_IP) as api_client:
+            blocked = await api_client.get(BLACKLIST_LIST_URL)
+        async with client_from("198.52.0.1") as api_client:
+            allowed = await api_client.get(BLACKLIST_LIST_URL)
+
+        assert response.json()["host"] == data["host"]
+        assert blocked.status_code == status.HTTP_403_FORBIDDEN
+        assert allowed.status_code == status.HTTP_200_OK
+
     async def test_show_blacklist(self, api_client, create_blacklist):
         response = await api_client.get(BLACKLIST_LIST_URL)
 
@@ -107,6 +154,33 @@ class TestDbAPIs:
         )
 
 
+class TestStatsAPIs:
+    async def test_metrics(self, api_client):
+        url = await ShortedURLFactory()
+        await api_client.get(SHORT_URL_DETAIL_URL.format(id=url.id))
+
+        response = await api_client.get(METRICS_URL)
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.headers["content-type"].startswith("text/plain")
+        assert (
+            'urlshorter_http_requests_total{method="GET",'
+            'route="/api/v1/{id}",status="307"}' in response.text
+        )
+        assert "urlshorter_url_cache_misses_total" in response.text
+        assert "urlshorter_click_pipeline_pending" in response.text
+
+    async def test_db_stats(self, api_client):
+        await api_client.get(PING_URL)
+
+        response = await api_client.get(DB_STATS_URL)
+        response_json = response.json()
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response_json["statements"]
+        assert all(s["count"] > 0 for s in response_json["statements"])
+
+
 class TestShortURLAPIs:
     @pytest.fixture
     async def create_short_url(self):
@@ -116,7 +190,7 @@ class TestShortURLAPIs:
     @pytest.fixture
     async def shortener_mock(self, mocker):
         shortener_mock = mocker.patch(
-            "api.v1.short_url.generate_short_url",
+            "src.api.v1.short_url.generate_short_url",
             side_effect=lambda url: TEST_SHORT_URL.format(url=url),
         )
         return shortener_mock
@@ -144,6 +218,63 @@ class TestShortURLAPIs:
         assert response_json["value"] == shortener_mock.side_effect(TEST_URL)
         shortener_mock.assert_called_once_with(TEST_URL)
 
+    async def test_bulk_create(self, api_client, create_short_url):
+        existing = create_short_url
+        originals = [
+            "https://bulk.ru/1",
+            existing.original,
+            "https://bulk.ru/2",
+            "https://bulk.ru/1",
+        ]
+
+        response = await api_client.post(
+            SHORT_URL_SHORTEN_URL,
+            json=[{"original_url": original} for original in originals],
+        )
+        response_json = response.json()
+        again = await api_client.post(
+            SHORT_URL_SHORTEN_URL, json=[{"original_url": originals[0]}]
+        )
+
+        assert response.status_code == status.HTTP_200_OK
+        assert len(response_json) == len(originals)
+        assert response_json[1]["short_id"] == existing.id
+        assert response_json[0] == response_json[3]
+        assert len({url["short_id"] for url in response_json}) == 3
+        assert again.json() == [response_json[0]]
+
+    async def test_stream_bulk_create_ndjson(self, api_client):
+        async def body():
+            yield b'{"original_url": "https://stream.ru/1"}\n{"original'
+            yield b'_url": "not a url"}\n{"original_url": "https://stream'
+            yield b'.ru/1"}\n'
+
+        response = await api_client.post(
+            SHORT_URL_SHORTEN_STREAM_URL,
+            content=body(),
+            headers={"Content-Type": "application/x-ndjson"},
+        )
+        results = [json.loads(line) for line in response.text.splitlines()]
+
+        assert response.status_code == status.HTTP_200_OK
+        assert [result["line"] for result in results] == [1, 2, 3]
+        assert "error" in results[1]
+        assert results[0]["original_url"] == "https://stream.ru/1"
+        assert results[0]["short_id"] == results[2]["short_id"]
+
+    async def test_stream_bulk_create_csv(self, api_client):
+        body = "name,original_url\na,https://csv.ru/1\nb,https://csv.ru/2\n"
+
+        response = await api_client.post(
+            SHORT_URL_SHORTEN_STREAM_URL,
+            content=body,
+            headers={"Content-Type": "text/csv"},
+        )
+        results = [json.loads(line) for line in response.text.splitlines()]
+
+        assert [result["line"] for result in results] == [2, 3]
+        assert results[1]["original_url"] == "https://csv.ru/2"
+
     async def test_retrieve(self, api_client, create_short_url):
         url = create_short_url
 
@@ -152,6 +283,73 @@ class TestShortURLAPIs:
         assert response.status_code == status.HTTP_307_TEMPORARY_REDIRECT
         assert response.headers["Location"] == create_short_url.original
 
+    async def test_retrieve_cached(self, api_client, create_short_url):
+        url = create_short_url
+        await api_client.get(SHORT_URL_DETAIL_URL.format(id=url.id))
+        before = (await api_client.get(CACHE_STATS_URL)).json()
+
+        response = await api_client.get(SHORT_URL_DETAIL_URL.format(id=url.id))
+        after = (await api_client.get(CACHE_STATS_URL)).json()
+
+        assert response.status_code == status.HTTP_307_TEMPORARY_REDIRECT
+        assert response.headers["Location"] == url.original
+        assert after["hits"] == before["hits"] + 1
+        assert after["misses"] == before["misses"]
+
+    async def test_retrieve_by_code(self, api_client):
+        original = "https://code.ru/"
+        created = await api_client.post(
+            SHORT_URL_LIST_URL, json={"original_url": original}
+        )
+        url = created.json()
+
+        response = await api_client.get(
+            SHORT_CODE_URL.format(code=url["code"])
+        )
+        cached = await api_client.get(SHORT_CODE_URL.format(code=url["code"]))
+        missing = await api_client.get(SHORT_CODE_URL.format(code="zzz"))
+
+        assert url["value"].endswith("/" + url["code"])
+        assert url["id"] == decode(url["code"])
+        assert response.status_code == status.HTTP_307_TEMPORARY_REDIRECT
+        assert response.headers["Location"] == original
+        assert cached.headers["Location"] == original
+        assert missing.status_code == status.HTTP_400_BAD_REQUEST
+
+    async def test_retrieve_by_code_looks_up_once(self, api_client):
+        created = await api_client.post(
+            SHORT_URL_LIST_URL, json={"original_url": "https://once.ru/"}
+        )
+        url_cache.clear()
+        misses = url_cache.misses
+
+        response = await api_client.get(
+            SHORT_CODE_URL.format(code=created.json()["code"])
+        )
+
+        assert response.status_code == status.HTTP_307_TEMPORARY_REDIRECT
+        assert url_cache.misses == misses + 1
+
+    async def test_retrieve_unknown_skips_db(self, api_client, mocker):
+        load_link = mocker.spy(short_url_service, "load_link")
+        url = SHORT_URL_DETAIL_URL.format(id=10**9)
+
+        first = await api_client.get(url)
+        second = await api_client.get(url)
+
+        assert first.status_code == status.HTTP_400_BAD_REQUEST
+        assert second.status_code == status.HTTP_400_BAD_REQUEST
+        assert load_link.call_count == 1
+
+    async def test_retrieve_deleted(self, api_client, create_short_url):
+        url = create_short_url
+        await api_client.get(SHORT_URL_DETAIL_URL.format(id=url.id))
+        await api_client.delete(SHORT_URL_DETAIL_URL.format(id=url.id))
+
+        response = await api_client.get(SHORT_URL_DETAIL_URL.format(id=url.id))
+
+        assert response.status_code == status.HTTP_410_GONE
+
     async def test_destroy(self, api_client, create_short_url):
         url = create_short_url
         assert not url.deleted
@@ -172,7 +370,13 @@ class TestShortURLAPIs:
 
     async def test_status(self, api_client, create_short_url):
         url = create_short_url
-        uses = [await ShortedURLInfoFactory(url_id=url.id) for _ in range(2)]
+        uses = [
+            click_pipeline.enqueue(
+                url_id=url.id, host=TEST_IP, port=port, user_agent="test"
+            )
+            for port in range(2)
+        ]
+        await click_pipeline.flush()
 
         response = await api_client.get(SHORT_URL_STATUS_URL.format(id=url.id))
 
@@ -198,12 +402,243 @@ class TestShortURLAPIs:
             assert "user_agent" in use
             assert "user_id" in use
 
+    async def test_status_full_info_cursor(self, api_client, create_short_url):
+        url = create_short_url
+        uses = [
+            await ShortedURLInfoFactory(url_id=url.id, created_at=created_at)
+            for created_at in [datetime(2023, 10, 1)] * 3
+            + [datetime.now()] * 2
+        ]
+        params = {"full_info": True, "max_result": 2}
+
+        seen = []
+        while True:
+            response = await api_client.get(
+                SHORT_URL_STATUS_URL.format(id=url.id), params=params
+            )
+            seen.extend(use["id"] for use in response.json())
+            if "X-Next-Cursor" not in response.headers:
+                break
+            params["cursor"] = response.headers["X-Next-Cursor"]
+
+        assert sorted(seen) == sorted(use.id for use in uses)
+        assert len(seen) == len(set(seen))
+
+    async def test_status_full_info_retention(
+        self, api_client, create_short_url, monkeypatch
+    ):
+        url = create_short_url
+        await ShortedURLInfoFactory(
+            url_id=url.id, created_at=datetime(2000, 1, 1)
+        )
+        recent = [
+            await ShortedURLInfoFactory(
+                url_id=url.id, created_at=datetime.utcnow()
+            )
+            for _ in range(2)
+        ]
+        monkeypatch.setattr(
+            "src.services.partitions.click_partitions.retention_months", 1
+        )
+
+        by_cursor = await api_client.get(
+            SHORT_URL_STATUS_URL.format(id=url.id), params={"full_info": True}
+        )
+        by_offset = await api_client.get(
+            SHORT_URL_STATUS_URL.format(id=url.id),
+            params={"full_info": True, "offset": 1},
+        )
+
+        assert [use["id"] for use in by_cursor.json()] == [
+            use.id for use in recent
+        ]
+        assert [use["id"] for use in by_offset.json()] == [recent[1].id]
+
+    async def test_status_page_size_validated(
+        self, api_client, create_short_url
+    ):
+        for max_result in (0, -1, 1001):
+            response = await api_client.get(
+                SHORT_URL_STATUS_URL.format(id=create_short_url.id),
+                params={"full_info": True, "max_result": max_result},
+            )
+
+            assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+    async def test_status_invalid_cursor(self, api_client, create_short_url):
+        response = await api_client.get(
+            SHORT_URL_STATUS_URL.format(id=create_short_url.id),
+            params={"full_info": True, "cursor": "???"},
+        )
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    async def test_export_ndjson(self, api_client, create_short_url):
+        url = create_short_url
+        uses = [await ShortedURLInfoFactory(url_id=url.id) for _ in range(3)]
+
+        response = await api_client.get(SHORT_URL_EXPORT_URL.format(id=url.id))
+        rows = [json.loads(line) for line in response.text.splitlines()]
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.headers["content-type"] == "application/x-ndjson"
+        assert [row["id"] for row in rows] == [use.id for use in uses]
+        assert rows[0]["user_agent"] == uses[0].user_agent
+
+    async def test_export_csv(self, api_client, create_short_url):
+        url = create_short_url
+        uses = [await ShortedURLInfoFactory(url_id=url.id) for _ in range(3)]
+
+        response = await api_client.get(
+            SHORT_URL_EXPORT_URL.format(id=url.id), params={"format": "csv"}
+        )
+        rows = list(csv.DictReader(io.StringIO(response.text)))
+
+        assert response.status_code == status.HTTP_200_OK
+        assert [int(row["id"]) for row in rows] == [use.id for use in uses]
+
+    async def test_analytics(self, api_client, create_short_url):
+        url = create_short_url
+        for created_at, user_agent in [
+            (datetime(2023, 10, 1, 10, 5), "curl"),
+            (datetime(2023, 10, 1, 10, 55), "curl"),
+            (datetime(2023, 10, 1, 11, 1), "firefox"),
+        ]:
+            await ShortedURLInfoFactory(
+                url_id=url.id,
+                created_at=created_at,
+                user_agent=user_agent,
+                host=TEST_IP,
+            )
+        await click_rollup.catch_up()
+
+        response = await api_client.get(
+            SHORT_URL_ANALYTICS_URL.format(id=url.id),
+            params={"granularity": "hour"},
+        )
+        response_json = response.json()
+
+        assert response.status_code == status.HTTP_200_OK
+        assert [b["count"] for b in response_json["buckets"]] == [2, 1]
+        assert response_json["top_user_agents"][0] == {
+            "value": "curl",
+            "count": 2,
+        }
+        assert response_json["top_hosts"] == [{"value": TEST_IP, "count": 3}]
+
     async def test_status_added(self, api_client, create_short_url_with_calls):
         url, before = create_short_url_with_calls
         await api_client.get(SHORT_URL_DETAIL_URL.format(id=url.id))
+        await click_pipeline.flush()
 
         async with async_session() as db:
             after = await url_info_service.count(
                 db=db, filter=dict(url_id=url.id)
             )
-        assert before + 1 == after
\ No newline at end of file
+        assert before + 1 == after
+
+
+class TestClickPipeline:
+    async def test_batched_write(self):
+        url = await ShortedURLFactory()
+        for port in range(3):
+            click_pipeline.enqueue(
+                url_id=url.id, host=TEST_IP, port=port, user_agent="test"
+            )
+        batches_before = click_pipeline.batches
+
+        written = await click_pipeline.flush()
+
+        assert written == 3
+        assert click_pipeline.batches == batches_before + 1
+        async with async_session() as db:
+            count = await url_info_service.count(
+                db=db, filter=dict(url_id=url.id)
+            )
+            clicks = await short_url_service.get_clicks(db=db, id=url.id)
+        assert count == 3
+        assert clicks == 3
+
+    async def test_overflow_dropped(self, monkeypatch):
+        monkeypatch.setattr(click_pipeline, "max_size", 0)
+        dropped_before = click_pipeline.dropped
+
+        assert not click_pipeline.enqueue(
+            url_id=1, host=TEST_IP, port=1, user_agent="test"
+        )
+        assert click_pipeline.dropped == dropped_before + 1
+
+
+class TestClickRollup:
+    async def test_concurrent_runs_count_once(self, engine):
+        url = await ShortedURLFactory()
+        for _ in range(3):
+            await ShortedURLInfoFactory(
+                url_id=url.id, created_at=datetime(2023, 10, 2, 10)
+            )
+
+        async with AsyncSession(engine) as first, AsyncSession(
+            engine
+        ) as second:
+            await asyncio.gather(
+                click_rollup.run_once(first), click_rollup.run_once(second)
+            )
+        await click_rollup.catch_up()
+
+        async with AsyncSession(engine) as db:
+            clicks = await db.scalar(
+                select(ClickRollup.clicks).where(
+                    ClickRollup.url_id == url.id,
+                    ClickRollup.granularity == "day",
+                )
+            )
+        assert clicks == 3
+
+    async def test_late_lower_id_counted(self):
+        url = await ShortedURLFactory()
+        now = datetime.utcnow()
+        first = await ShortedURLInfoFactory(url_id=url.id, created_at=now)
+        await ShortedURLInfoFactory(
+            id=first.id + 2, url_id=url.id, created_at=now
+        )
+        await click_rollup.catch_up()
+        await ShortedURLInfoFactory(
+            id=first.id + 1, url_id=url.id, created_at=now
+        )
+        await click_rollup.catch_up()
+
+        async with async_session() as db:
+            rollups = await get_buckets(db, url.id, "day")
+        assert [clicks for _, clicks in rollups] == [3]
+
+    async def test_old_gap_skipped(self):
+        url = await ShortedURLFactory()
+        moment = datetime(2023, 10, 2, 10)
+        first = await ShortedURLInfoFactory(url_id=url.id, created_at=moment)
+        await ShortedURLInfoFactory(
+            id=first.id + 2, url_id=url.id, created_at=moment
+        )
+
+        assert await click_rollup.catch_up() == 2
+
+
+class TestLifespan:
+    async def test_warm_up_primes_cache(self):
+        url = await ShortedURLFactory(clicks=10**6)
+
+        await warm_up()
+
+        assert url_cache.get(url.id).original == url.original
+
+    async def test_startup_and_shutdown(self):
+        url = await ShortedURLFactory()
+
+        async with lifespan(app):
+            click_pipeline.enqueue(
+                url_id=url.id, host=TEST_IP, port=1, user_agent="test"
+            )
+
+        assert len(click_pipeline) == 0
+        async with async_session() as db:
+            clicks = await short_url_service.get_clicks(db=db, id=url.id)
+        assert clicks == 1
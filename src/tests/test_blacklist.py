@@ -0,0 +1,85 @@
+import asyncio
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+from src.db.db import async_session
+from src.services.blacklist import BlacklistIndex, blacklist_index
+from src.services.services import blacklist_service
+
+from .factories import BlacklistClientFactory
+
+
+class TestBlacklistIndex:
+    def test_longest_and_shortest_prefix(self):
+        index = BlacklistIndex()
+        index.add(1, "10.0.0.0/8")
+        index.add(2, "192.168.1.7")
+        index.add(3, "2001:db8::/32")
+
+        assert index.contains("10.200.3.4")
+        assert index.contains("192.168.1.7")
+        assert not index.contains("192.168.1.8")
+        assert index.contains("2001:db8::1")
+        assert not index.contains("2001:db9::1")
+        assert not index.contains("testclient")
+
+    def test_remove(self):
+        index = BlacklistIndex()
+        index.add(1, "10.0.0.0/8")
+        index.add(2, "10.0.0.0/8")
+
+        index.remove(1)
+        assert index.contains("10.1.1.1")
+        index.remove(2)
+        assert not index.contains("10.1.1.1")
+        assert len(index) == 0
+
+    def test_expiry(self):
+        index = BlacklistIndex()
+        now = datetime.now()
+        index.add(1, "10.0.0.1", until=now + timedelta(minutes=1))
+        index.add(2, "10.0.0.2", until=now + timedelta(minutes=5))
+        index.add(3, "10.0.0.3", until=now - timedelta(minutes=1))
+
+        assert index.contains("10.0.0.1")
+        assert not index.contains("10.0.0.3")
+        assert index.expire(time.time() + 120) == 1
+        assert not index.contains("10.0.0.1")
+        assert index.contains("10.0.0.2")
+
+    @pytest.mark.anyio
+    async def test_purge_expired(self):
+        expired = await BlacklistClientFactory(
+            until=datetime.now() - timedelta(minutes=1)
+        )
+        active = await BlacklistClientFactory(
+            until=datetime.now() + timedelta(minutes=1)
+        )
+
+        await blacklist_index.purge()
+
+        async with async_session() as db:
+            ids = [
+                client.id for client in await blacklist_service.get_multi(db)
+            ]
+            await blacklist_service.delete(db=db)
+        assert expired.id not in ids
+        assert active.id in ids
+
+    @pytest.mark.anyio
+    async def test_purge_without_refresh(self):
+        expired = await BlacklistClientFactory(
+            until=datetime.now() - timedelta(minutes=1)
+        )
+        index = BlacklistIndex(refresh_interval=0, purge_interval=0.01)
+
+        await index.start()
+        await asyncio.sleep(0.1)
+        await index.stop()
+
+        async with async_session() as db:
+            clients = await blacklist_service.get_multi(db)
+            await blacklist_service.delete(db=db)
+        assert expired.id not in [client.id for client in clients]
@@ -0,0 +1,60 @@
+import pytest
+
+from src.services.bloom import BloomFilter, LinkFilter
+
+from .factories import ShortedURLFactory
+
+pytestmark = pytest.mark.anyio
+
+
+class TestBloomFilter:
+    def test_no_false_negatives(self):
+        bloom = BloomFilter(capacity=1000, error_rate=0.01)
+        for key in range(0, 3000, 3):
+            bloom.add(key)
+
+        assert all(key in bloom for key in range(0, 3000, 3))
+
+    def test_false_positive_rate(self):
+        bloom = BloomFilter(capacity=1000, error_rate=0.01)
+        for key in range(1000):
+            bloom.add(key)
+
+        positives = sum(key in bloom for key in range(10**6, 10**6 + 10000))
+
+        assert positives < 300
+
+
+class TestLinkFilter:
+    async def test_trusts_ids_seen_a_reload_earlier(self):
+        link_filter = LinkFilter(capacity=100)
+        url = await ShortedURLFactory()
+
+        await link_filter.reload()
+        first_watermark = link_filter.watermark
+        await link_filter.reload()
+
+        assert first_watermark == 0
+        assert link_filter.watermark >= url.id
+        assert link_filter.known_missing(0)
+        assert not link_filter.known_missing(url.id)
+        assert not link_filter.known_missing(link_filter.watermark + 1)
+
+    def test_misses_invalidated_on_add(self):
+        link_filter = LinkFilter(capacity=100)
+        link_filter.miss(10)
+        link_filter.miss("abc")
+
+        missing = [link_filter.known_missing(key) for key in (10, "abc")]
+        link_filter.add(10, "abc")
+
+        assert missing == [True, True]
+        assert not link_filter.known_missing(10)
+        assert not link_filter.known_missing("abc")
+
+    def test_ids_out_of_range_missing(self):
+        link_filter = LinkFilter(capacity=100)
+
+        assert link_filter.known_missing(0)
+        assert link_filter.known_missing(-(2**70))
+        assert link_filter.known_missing(2**63)
@@ -0,0 +1,106 @@
+import pytest
+
+from src.services.invalidation import (
+    InvalidationBroker,
+    RedisBackend,
+    SharedMemoryBackend,
+)
+
+from .fake_redis import FakeRedis
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+async def fake_redis():
+    server = FakeRedis()
+    await server.start()
+    yield server
+    await server.stop()
+
+
+class TestSharedMemoryBackend:
+    async def test_between_workers(self, tmp_path):
+        path = str(tmp_path / "invalidations")
+        first = SharedMemoryBackend(path, slots=8)
+        second = SharedMemoryBackend(path, slots=8)
+        await second.fetch()
+
+        await first.publish(1, "link", "42")
+        await first.publish(1, "blacklist", "7")
+
+        assert await second.fetch() == [
+            (1, "link", "42"),
+            (1, "blacklist", "7"),
+        ]
+        assert await second.fetch() == []
+
+    async def test_lapped_reader_resets(self, tmp_path):
+        path = str(tmp_path / "invalidations")
+        first = SharedMemoryBackend(path, slots=4)
+        second = SharedMemoryBackend(path, slots=4)
+        await second.fetch()
+
+        for id in range(5):
+            await first.publish(1, "link", str(id))
+
+        assert await second.fetch() is None
+        assert await second.fetch() == []
+
+
+class TestRedisBackend:
+    async def test_between_workers(self, fake_redis):
+        first = RedisBackend(fake_redis.url)
+        second = RedisBackend(fake_redis.url, count=1)
+        await second.fetch()
+
+        await first.publish(1, "link", "42")
+        await first.publish(1, "link", "43")
+
+        assert await second.fetch() == [(1, "link", "42"), (1, "link", "43")]
+        assert await second.fetch() == []
+        await first.close()
+        await second.close()
+
+
+class TestInvalidationBroker:
+    async def test_applies_foreign_messages_only(self, tmp_path):
+        path = str(tmp_path / "invalidations")
+        publisher = InvalidationBroker(SharedMemoryBackend(path))
+        subscriber = InvalidationBroker(SharedMemoryBackend(path))
+        received = []
+        for broker in (publisher, subscriber):
+            broker.subscribe("link", received.append)
+            await broker.poll()
+
+        await publisher.publish("link", 42)
+        await publisher.publish("link", 42)
+        own = await publisher.poll()
+        applied = await subscriber.poll()
+
+        assert own == 0
+        assert applied == 1
+        assert received == [{"42"}]
+
+    async def test_reset_on_lost_messages(self, tmp_path):
+        path = str(tmp_path / "invalidations")
+        publisher = InvalidationBroker(SharedMemoryBackend(path, slots=2))
+        subscriber = InvalidationBroker(SharedMemoryBackend(path, slots=2))
+        received = []
+        resets = []
+        subscriber.subscribe(
+            "link", received.append, reset=lambda: resets.append(1)
+        )
+        await subscriber.poll()
+
+        for id in range(3):
+            await publisher.publish("link", id)
+        await subscriber.poll()
+        lapped = list(received)
+        await publisher.publish("link", 3)
+        await subscriber.poll()
+
+        assert lapped == []
+        assert resets == [1]
+        assert subscriber.resets == 1
+        assert received == [{"3"}]
@@ -0,0 +1,60 @@
+import io
+import logging
+
+import orjson
+
+from src.core.logger import (
+    JSONFormatter,
+    QueueLogHandler,
+    SamplingFilter,
+    parse_sample_rates,
+)
+
+
+def make_record(name: str = "api.v1.short_url", level: int = logging.INFO):
+    return logging.makeLogRecord(
+        {
+            "name": name,
+            "levelno": level,
+            "levelname": logging.getLevelName(level),
+            "msg": "Redirecting to: %s",
+            "args": ("https://example.com",),
+        }
+    )
+
+
+def test_json_formatter():
+    record = make_record()
+    record.url_id = 7
+
+    entry = orjson.loads(JSONFormatter().format(record))
+
+    assert entry["message"] == "Redirecting to: https://example.com"
+    assert entry["level"] == "INFO"
+    assert entry["logger"] == "api.v1.short_url"
+    assert entry["url_id"] == 7
+
+
+def test_sampling_by_logger():
+    sampling = SamplingFilter(parse_sample_rates("api.v1=0, services=0.5"))
+
+    assert sampling.rate("src.api.v1.short_url") == 0
+    assert sampling.rate("services.shorter") == 0.5
+    assert sampling.rate("main") == 1
+    assert not sampling.filter(make_record())
+    assert sampling.filter(make_record(level=logging.WARNING))
+    assert sampling.filter(make_record(name="main"))
+    assert sampling.dropped == 1
+
+
+def test_queue_handler_writes_on_close():
+    stream = io.StringIO()
+    target = logging.StreamHandler(stream)
+    target.setFormatter(JSONFormatter())
+    handler = QueueLogHandler([target])
+
+    handler.handle(make_record())
+    handler.close()
+
+    (line,) = stream.getvalue().splitlines()
+    assert orjson.loads(line)["message"].startswith("Redirecting to")
@@ -0,0 +1,104 @@
+import gzip
+from datetime import datetime
+
+import orjson
+import pytest
+from sqlalchemy import func, select
+
+from src.db.locks import exclusive_session
+from src.models.models import ShortedURLInfo
+from src.services.partitions import (
+    ClickPartitionManager,
+    month_start,
+    partition_name,
+)
+from src.services.services import url_info_service
+
+from .factories import ShortedURLFactory, ShortedURLInfoFactory
+
+pytestmark = pytest.mark.anyio
+
+
+def test_month_start():
+    moment = datetime(2024, 1, 31, 23, 59)
+
+    assert month_start(moment) == datetime(2024, 1, 1)
+    assert month_start(moment, -1) == datetime(2023, 12, 1)
+    assert month_start(moment, 13) == datetime(2025, 2, 1)
+    assert partition_name(moment) == "shorted_url_info_y2024m01"
+
+
+def test_cutoff():
+    now = datetime(2024, 3, 15)
+
+    assert ClickPartitionManager().cutoff(now) is None
+    assert ClickPartitionManager(retention_months=2).cutoff(
+        now
+    ) == datetime(2024, 1, 1)
+
+
+async def test_expire_archives_and_deletes(session, tmp_path):
+    url = await ShortedURLFactory()
+    # older than any date the factories make up
+    for created_at in ("1960-01-10", "1960-01-20", "1960-03-05", "1960-05-01"):
+        await ShortedURLInfoFactory(
+            url_id=url.id, created_at=datetime.fromisoformat(created_at)
+        )
+    manager = ClickPartitionManager(
+        retention_months=1, archive_dir=str(tmp_path)
+    )
+
+    expired = await manager.expire(session, datetime(1960, 6, 15))
+
+    left = await session.scalar(
+        select(func.count(ShortedURLInfo.id)).where(
+            ShortedURLInfo.url_id == url.id
+        )
+    )
+    with gzip.open(tmp_path / "shorted_url_info_y1960m01.ndjson.gz") as f:
+        archived = [orjson.loads(line) for line in f]
+    assert expired == 4
+    assert left == 1
+    assert sorted(path.name for path in tmp_path.iterdir()) == [
+        "shorted_url_info_y1960m01.ndjson.gz",
+        "shorted_url_info_y1960m03.ndjson.gz",
+    ]
+    assert [click["created_at"] for click in archived] == [
+        "1960-01-10T00:00:00",
+        "1960-01-20T00:00:00",
+    ]
+    assert manager.stats()["archived"] == 3
+
+
+async def test_history_clamped_to_retention(session, monkeypatch):
+    url = await ShortedURLFactory()
+    old = await ShortedURLInfoFactory(
+        url_id=url.id, created_at=datetime(2000, 1, 1)
+    )
+    recent = await ShortedURLInfoFactory(
+        url_id=url.id, created_at=datetime.utcnow()
+    )
+    monkeypatch.setattr(
+        "src.services.partitions.click_partitions.retention_months", 1
+    )
+
+    page = await url_info_service.get_page(
+        session, filter={"url_id": url.id}
+    )
+    listed = await url_info_service.get_multi(
+        session, filter={"url_id": url.id}
+    )
+
+    # still stored until maintenance expires it, just not read anymore
+    assert await session.get(ShortedURLInfo, old.id) is not None
+    assert [info.id for info in page] == [recent.id]
+    assert [info.id for info in listed] == [recent.id]
+
+
+async def test_one_maintenance_run_at_a_time():
+    async with exclusive_session("click_partitions") as db:
+        async with exclusive_session("click_partitions") as other:
+            assert db is not None
+            assert other is None
+    async with exclusive_session("click_partitions") as db:
+        assert db is not None
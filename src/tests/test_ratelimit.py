@@ -0,0 +1,85 @@
+import asyncio
+
+import pytest
+from fastapi import status
+
+from src.services.blacklist import blacklist_index
+from src.services.ratelimit import (
+    RateLimiter,
+    RateRule,
+    rate_limiter,
+    route_rule,
+)
+
+from .test_api import SHORT_URL_LIST_URL, client_from
+
+pytestmark = pytest.mark.anyio
+
+
+class TestRateLimiter:
+    def test_parse(self):
+        assert RateRule.parse("create", "30/60") == RateRule(
+            "create", 0.5, 30
+        )
+        assert RateRule.parse("create", "") is None
+        assert RateRule.parse("create", "0/60") is None
+        assert RateRule.parse("create", "0") is None
+
+    def test_disabled_by_default(self):
+        assert rate_limiter.rules == {}
+
+    def test_route_rule(self):
+        assert route_rule("POST", "/api/v1/") == "create"
+        assert route_rule("POST", "/api/v1/shorten/stream") == "shorten"
+        assert route_rule("GET", "/api/v1/42") == "redirect"
+        assert route_rule("GET", "/aZ3") == "redirect"
+        assert route_rule("GET", "/api/v1/42/status") is None
+        assert route_rule("GET", "/metrics") is None
+
+    def test_bucket(self):
+        limiter = RateLimiter([RateRule("create", 1, 2)])
+
+        burst = [limiter.hit("10.0.0.1", "create", now=0) for _ in range(3)]
+        refilled = limiter.hit("10.0.0.1", "create", now=1)
+
+        assert burst == [0, 0, 1]
+        assert refilled == 0
+        assert limiter.hit("10.0.0.2", "create", now=1) == 0
+        assert limiter.hit("10.0.0.1", "other", now=1) == 0
+
+    def test_idle_and_overflow_eviction(self):
+        limiter = RateLimiter([RateRule("create", 1, 2)], max_buckets=2)
+        limiter.hit("10.0.0.1", "create", now=0)
+        limiter.hit("10.0.0.2", "create", now=1)
+
+        limiter.hit("10.0.0.3", "create", now=2.5)
+
+        assert len(limiter) == 2
+        assert limiter.evictions == 1
+        limiter.hit("10.0.0.4", "create", now=10)
+        assert len(limiter) == 1
+
+    async def test_auto_ban(self):
+        limiter = RateLimiter([RateRule("create", 1, 1)], ban_after=2)
+
+        for _ in range(3):
+            limiter.hit("10.9.9.9", "create", now=0)
+        await asyncio.gather(*limiter._tasks)
+
+        assert limiter.bans == 1
+        assert blacklist_index.contains("10.9.9.9")
+        assert len(limiter) == 0
+
+    async def test_middleware(self, monkeypatch):
+        monkeypatch.setattr(
+            rate_limiter, "rules", {"create": RateRule("create", 0.01, 1)}
+        )
+        data = {"original_url": "https://limited.ru/"}
+
+        async with client_from("10.8.8.8") as client:
+            first = await client.post(SHORT_URL_LIST_URL, json=data)
+            second = await client.post(SHORT_URL_LIST_URL, json=data)
+
+        assert first.status_code == status.HTTP_201_CREATED
+        assert second.status_code == status.HTTP_429_TOO_MANY_REQUESTS
+        assert second.headers["Retry-After"] == "100"
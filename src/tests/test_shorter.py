@@ -0,0 +1,62 @@
+import pytest
+
+from src.db.db import async_session
+from src.services import shorter
+from src.services.shorter import (
+    HashCodeGenerator,
+    SequenceCodeGenerator,
+    claim_worker_id,
+    decode,
+    encode,
+    ensure_unique,
+)
+
+from .factories import ShortedURLFactory
+
+pytestmark = pytest.mark.anyio
+
+
+class TestCodeGenerators:
+    def test_encode_decode(self):
+        for number in (0, 61, 62, 3843, 2**63):
+            assert decode(encode(number)) == number
+
+    def test_sequence_unique(self):
+        generator = SequenceCodeGenerator(worker_id=1)
+        codes = {generator.generate("") for _ in range(10000)}
+
+        assert len(codes) == 10000
+
+    def test_worker_ids_claimed_once(self):
+        claimed = [claim_worker_id(6, base=60) for _ in range(2)]
+
+        assert len(set(claimed)) == 2
+        assert all(60 <= worker_id < 64 for worker_id in claimed)
+
+    def test_hash_deterministic(self):
+        generator = HashCodeGenerator(length=6)
+
+        assert generator.generate("https://a.ru/") == generator.generate(
+            "https://a.ru/"
+        )
+        assert generator.generate("https://a.ru/") != generator.generate(
+            "https://a.ru/", attempt=1
+        )
+        assert len(generator.generate("https://a.ru/")) == 6
+
+    async def test_ensure_unique_regenerates(self, mocker):
+        generator = HashCodeGenerator()
+        mocker.patch.object(shorter, "get_generator", return_value=generator)
+        taken = await ShortedURLFactory(
+            value=generator.short_url("https://b.ru/")
+        )
+
+        async with async_session() as db:
+            values = await ensure_unique(
+                db,
+                ["https://b.ru/", "https://b.ru/"],
+                [taken.value, taken.value],
+            )
+
+        assert taken.value not in values
+        assert len(set(values)) == 2
@@ -0,0 +1,62 @@
+import pytest
+from sqlalchemy import func, select, text
+
+from src.models.models import UserAgent
+from src.services.clicks import click_pipeline
+from src.services.user_agents import user_agents
+
+from .factories import ShortedURLFactory
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_intern_stores_each_value_once(session):
+    values = ["intern-a", "intern-b", "intern-a"]
+
+    ids = await user_agents.intern(values)
+    user_agents.clear()
+    again = await user_agents.intern(values)
+
+    stored = await session.scalar(
+        select(func.count(UserAgent.id)).where(UserAgent.value.in_(values))
+    )
+    assert ids == again
+    assert len(set(ids.values())) == 2
+    assert stored == 2
+
+
+async def test_resolve_from_cache(session):
+    ids = await user_agents.intern(["resolve-a", "resolve-b"])
+    misses = user_agents.stats()["misses"]
+
+    values = await user_agents.resolve(session, ids.values())
+
+    assert values == {id: value for value, id in ids.items()}
+    assert user_agents.stats()["misses"] == misses
+
+
+async def test_clicks_stored_compact(session):
+    url = await ShortedURLFactory()
+    click_pipeline.enqueue(
+        url_id=url.id, host="10.1.2.3", port=1, user_agent="compact"
+    )
+    click_pipeline.enqueue(
+        url_id=url.id, host="testclient", port=2, user_agent="compact"
+    )
+    await click_pipeline.flush()
+
+    rows = (
+        await session.execute(
+            text(
+                "SELECT host, user_agent_id FROM shorted_url_info "
+                "WHERE url_id = :id ORDER BY port"
+            ),
+            {"id": url.id},
+        )
+    ).all()
+
+    ids = await user_agents.intern(["compact"])
+    assert rows == [
+        (bytes([10, 1, 2, 3]), ids["compact"]),
+        (bytes(4), ids["compact"]),
+    ]